@@ -3,8 +3,114 @@
 
 import os
 import warnings
-import geopandas as gpd
-
+from contextlib import contextmanager
+
+# stage records (timers, memory, row counts, bytes) of the run, see stage_timer
+STAGE_RECORDS = []
+
+# peak memory of the open (nested) stage timers, see stage_timer
+OPEN_TIMER_PEAKS = []
+
+# prefix of the records of the pipeline stages (see run_stage), these records and the record total contain the
+# records of the processing steps and are not listed as hot spots
+PIPELINE_RECORD_PREFIX = 'stage:'
+
+# columns of the subsets exported for each canton
+SUBSET_COLUMNS = ['Kanton', 'Format', 'Berechnungsintervall', 'IDLaenge', 'KBfrei', 'AmpelCodePers', 'AmpelCodeOFG',
+                  'AmpelCodeGW', 'geometry']
+
+# types of the normalized subset columns (see normalize_subset)
+SUBSET_DTYPES = {'Kanton': 'category', 'Format': 'category', 'Berechnungsintervall': 'category',
+                 'IDLaenge': 'float32', 'KBfrei': 'bool', 'AmpelCodePers': 'Int8', 'AmpelCodeOFG': 'Int8',
+                 'AmpelCodeGW': 'Int8'}
+
+# folders the subsets of the cantons are exported to, the subsets are written once to the first folder (canonical
+# store) and linked into the other folders (see export_subset)
+ILI_SUBSET_DIRS = ['Data/RESULTS/GPKG_EXPORT_SUBSET', 'Data/ILI_GPKG_EXPORT_SUBSET']
+XLSX_SUBSET_DIRS = ['Data/RESULTS/GPKG_EXPORT_SUBSET', 'Data/XLSX_GPKG_EXPORT_SUBSET']
+
+# tables of the ILI XTF files that are joined to the points and key fields of the ILI objects
+ILI_JOIN_TABLES = ['Ergebnis', 'Vollzug', 'Verkehrsaufkommen']
+ILI_KEY_FIELDS = ['TID', 'tid', 'T_Id', 't_id', 'T_ILI_Tid']
+
+# filters for the fields of the ILI converted GPKG files needed for the statistics (in the order of SUBSET_COLUMNS)
+ILI_COLUMN_FILTERS = ['IDLaenge', 'KBfrei', 'Ergebnis_AmpelCodePers', 'Ergebnis_AmpelCodeOFG', 'Ergebnis_AmpelCodeGW']
+
+# columns of the ERKAS Excel files needed for the statistics and the geometry of the subsets
+XLSX_COLUMNS = ['Inhaber', 'IDLaenge', 'KBfrei', 'AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW', 'Ort_E-Coord',
+                'Ort_N-Coord']
+
+# cantons in the order of the cantonal numbers of the BFS (Inhaber values like CH22 are cantonal numbers)
+CANTONS = ['ZH', 'BE', 'LU', 'UR', 'SZ', 'OW', 'NW', 'GL', 'ZG', 'FR', 'SO', 'BS', 'BL', 'SH', 'AR', 'AI', 'SG', 'GR',
+           'AG', 'TG', 'TI', 'VD', 'VS', 'NE', 'GE', 'JU']
+
+# spelling variants of the columns of the ERKAS Excel files (upper and lower case, umlauts and separators are
+# ignored in any case, see xlsx_column_key)
+XLSX_HEADER_ALIASES = {
+    'KBfrei': ['KBbefreit'],
+    'Ort_E-Coord': ['Ort_E-Koord', 'Ort_E-Koordinate', 'Ort_E'],
+    'Ort_N-Coord': ['Ort_N-Koord', 'Ort_N-Koordinate', 'Ort_N'],
+}
+
+# values of the field KBfrei in the Excel files (lower case, values that are not listed are False)
+BOOLEAN_VALUES = {'true': True, 'wahr': True, 'ja': True, 'j': True, 'yes': True, 'y': True, 'oui': True,
+                  'vrai': True, '1': True, 'false': False, 'falsch': False, 'nein': False, 'n': False, 'no': False,
+                  'non': False, 'faux': False, '0': False}
+
+# bounds of the LV95 coordinates of Switzerland (easting and northing) in meters
+LV95_EAST_BOUNDS = (2480000, 2840000)
+LV95_NORTH_BOUNDS = (1070000, 1300000)
+
+# level of the Hilbert curve the points of the visualisation are sorted by (2**level cells per axis of the LV95
+# bounds, about 5 m at level 16)
+HILBERT_LEVEL = 16
+
+# cell sizes of the summary grid layers of the visualisation in meters (see export_visualisation)
+VISUALISATION_GRID_SIZES = [1000, 5000, 20000]
+
+# columns of the compatibility report of the input files (see preflight_inputs)
+PREFLIGHT_COLUMNS = ['file', 'format', 'canton', 'status', 'features', 'problems', 'path', 'mtime_ns', 'size']
+
+# IDLaenge values of an Excel file with a median below this value are kilometers instead of meters
+XLSX_LENGTH_KM_LIMIT = 0.5
+
+# folder of the correction logs of the Excel files (one CSV file per canton)
+XLSX_CORRECTION_DIR = 'Data/RESULTS/XLSX_CORRECTIONS'
+
+# Ampelcode fields of the subsets and the classes counted as beurteilt
+AMPELCODE_COLUMNS = ['AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW']
+AMPELCODE_CLASSES_BEURTEILT = [1, 2, 3, 4]
+
+# keys of the statistical results (one row per canton and format)
+RESULT_KEYS = ['Kanton', 'Format']
+
+# columns of the partial statistics besides the keys and the length sums per Ampelcode class
+PARTIAL_COLUMNS = ['IDLaenge', 'KBbefreit', 'first', 'min', 'max']
+
+# column order of the statistical results
+RESULT_COLUMNS = ['Kanton', 'Format', 'Berechnungsintervall [m]', 'Durchgangsstrasse [km]', 'KB-befreit [km]',
+                  'Zu beurteilen AmpelcodePers [km]', 'Beurteilt AmpelcodePers [km]', 'AmpelcodePers0',
+                  'AmpelcodePers1', 'AmpelcodePers2', 'AmpelcodePers3', 'AmpelcodePers4', 'AmpelcodePers5',
+                  'Zu beurteilen AmpelcodeOFG [km]', 'Beurteilt AmpelcodeOFG [km]', 'AmpelcodeOFG0', 'AmpelcodeOFG1',
+                  'AmpelcodeOFG2', 'AmpelcodeOFG3', 'AmpelcodeOFG4', 'AmpelcodeOFG5',
+                  'Zu beurteilen AmpelcodeGW [km]', 'Beurteilt AmpelcodeGW [km]', 'AmpelcodeGW0', 'AmpelcodeGW1',
+                  'AmpelcodeGW2', 'AmpelcodeGW3', 'AmpelcodeGW4', 'AmpelcodeGW5']
+
+
+# stages of the processing pipeline and the stages they depend on (see run_pipeline)
+PIPELINE_STAGES = {
+    'convert': [],
+    'preflight': ['convert'],
+    'ili_stats': ['preflight'],
+    'xlsx_stats': ['preflight'],
+    'combine_results': ['ili_stats', 'xlsx_stats'],
+    'combine_gpkgs': ['ili_stats', 'xlsx_stats'],
+    'visualisation': ['ili_stats', 'xlsx_stats'],
+}
+
+# stages of the pipeline that process the cantons in a process pool, stages that run at the same time share the
+# worker processes of the pipeline (see run_pipeline)
+PIPELINE_POOL_STAGES = ['convert', 'preflight', 'ili_stats', 'xlsx_stats']
 
 def list_file_paths(folder_path, file_type):
     """This function creates a list of specific file paths in a directory and its subdirectories.
@@ -22,26 +128,156 @@ def list_file_paths(folder_path, file_type):
     return file_path_list
 
 
-def ilixtf2gpkg(ili_dir, gpkg_dir):
+def select_canton_files(files, cantons=None):
+    """Selects the files of some cantons by the canton abbreviation in the file name (e.g. ERKAS_Strassen_ZH_2021).
+
+    Args:
+        files (list): List of file paths
+        cantons (list): Abbreviations of the cantons (None: all files)
+
+    Returns:
+        list: The files of the cantons in the original order
+    """
+    import re
+    from pathlib import Path
+
+    if cantons is None:
+        return files
+    cantons = {canton.upper() for canton in cantons}
+    return [file for file in files if cantons & {part.upper() for part in re.split(r'[^A-Za-z]+', Path(file).stem)}]
+
+
+def ilixtf2gpkg(ili_dir, gpkg_dir, workers=1, join_tables=True, overwrite=False, cantons=None):
     """This function converts ILI XTF file(s) in a directory to GPKG file(s).
 
+    The files are converted in process with the GDAL/OGR bindings, several files are converted in parallel. If
+    join_tables is set, the tables Ergebnis, Vollzug and Verkehrsaufkommen are joined to the points (like the joins
+    that were done in QGIS before), so that the GPKG files can be used with calculate_statistics_from_ili_gpkg.
+
     Args:
         ili_dir (string): Path to the directory where ILI XTF files are stored
         gpkg_dir (string): Path to the directory where GPKG files should be stored
+        workers (int): Number of worker processes (1: sequential, None: number of CPUs)
+        join_tables (bool): Join the tables of ILI_JOIN_TABLES to the points (False: convert all layers as they are)
+        overwrite (bool): Convert files again even if the GPKG file is newer than the ILI XTF file (e.g. because it was
+            corrected by hand)
+        cantons (list): Abbreviations of the cantons to convert (see select_canton_files, None: all files)
     """
-    from osgeo import ogr
-    import os
+    from functools import partial
+
     if not os.path.exists(gpkg_dir):
         os.makedirs(gpkg_dir)
 
-    ili_files = list_file_paths(ili_dir, '*.xtf')
+    ili_files = select_canton_files(sorted(list_file_paths(ili_dir, '*.xtf')), cantons)
+    # the converted files are written by the workers, only the errors are needed
+    errors = run_per_canton(partial(convert_ili_xtf_file, gpkg_dir=gpkg_dir, join_tables=join_tables,
+                                    overwrite=overwrite), ili_files, workers=workers)[1]
+    print_error_summary(errors)
+
+
+def convert_ili_xtf_file(ili_file, gpkg_dir, join_tables=True, overwrite=False):
+    """Converts a single ILI XTF file to a GPKG file.
+
+    Args:
+        ili_file (Path): Path to the ILI XTF file
+        gpkg_dir (string): Path to the directory where the GPKG file should be stored
+        join_tables (bool): Join the tables of ILI_JOIN_TABLES to the points (False: convert all layers as they are)
+        overwrite (bool): Convert the file again even if the GPKG file is newer than the ILI XTF file
+
+    Returns:
+        string: Path to the GPKG file
+    """
+    import tempfile
+    from osgeo import gdal
+
+    gpkg_path = os.path.join(gpkg_dir, ili_file.stem + ".gpkg")
+    if not overwrite and os.path.exists(gpkg_path) and os.path.getmtime(gpkg_path) >= os.path.getmtime(ili_file):
+        print(f"Up to date: {ili_file.stem}")
+        return gpkg_path
+    print(f"Processing: {ili_file.stem}")
+
+    gdal.UseExceptions()
+    # assign EPSG:2056 to the layers (-a_srs)
+    options = gdal.VectorTranslateOptions(format='GPKG', dstSRS='EPSG:2056', reproject=False)
+    with stage_timer('convert', ili_file.stem) as record, tempfile.TemporaryDirectory(dir=gpkg_dir) as tmp_dir:
+        raw_path = os.path.join(tmp_dir, ili_file.stem + ".gpkg")
+        dataset = gdal.VectorTranslate(raw_path, str(ili_file), options=options)
+        # closes the dataset and flushes it to disk
+        dataset = None
+        if join_tables:
+            gdf = join_ili_gpkg_layers(raw_path)
+            record['rows'] = len(gdf)
+            joined_path = os.path.join(tmp_dir, "joined.gpkg")
+            gdf.to_file(joined_path, layer=ili_file.stem, driver='GPKG', engine='pyogrio', use_arrow=True)
+            raw_path = joined_path
+        os.replace(raw_path, gpkg_path)
+        record['bytes_read'] = file_size(ili_file)
+        record['bytes_written'] = file_size(gpkg_path)
+    return gpkg_path
+
+
+def join_ili_gpkg_layers(raw_path, join_tables=None):
+    """Joins the tables of a converted ILI XTF file to its points.
+
+    The point layer with the most features is used as the main layer. The tables are found by the last part of their
+    layer name (e.g. ERKAS.Ergebnis) and joined with a key join on the TID of the points. The field of the table that
+    references the points is detected from the values. Field names of the tables get the table name as prefix (e.g.
+    Ergebnis_AmpelCodePers), like with a join in QGIS.
+
+    Args:
+        raw_path (string): Path to the GPKG file with all layers of the ILI XTF file
+        join_tables (list): Names of the tables to join (default: ILI_JOIN_TABLES)
+
+    Returns:
+        GeoDataFrame: Points with the fields of the joined tables
+    """
+    import geopandas as gpd
+    import pyogrio
+
+    join_tables = ILI_JOIN_TABLES if join_tables is None else join_tables
+    layers = [(name, geometry_type) for name, geometry_type in pyogrio.list_layers(raw_path)]
+    point_layers = [name for name, geometry_type in layers if geometry_type and 'Point' in geometry_type]
+    if not point_layers:
+        raise ValueError(f"No point layer found in {raw_path}")
+    main_layer = max(point_layers, key=lambda name: pyogrio.read_info(raw_path, layer=name)['features'])
+    gdf = gpd.read_file(raw_path, layer=main_layer, engine='pyogrio', use_arrow=True)
+    main_key = next((field for field in ILI_KEY_FIELDS if field in gdf.columns), None)
+    if main_key is None:
+        raise ValueError(f"No key field ({ILI_KEY_FIELDS}) found in layer {main_layer}")
+
+    for table_name in join_tables:
+        layer = next((name for name, _ in layers if name.split('.')[-1].lower() == table_name.lower()), None)
+        if layer is None:
+            print(f"Table {table_name} not found, it is not joined")
+            continue
+        table = pyogrio.read_dataframe(raw_path, layer=layer, read_geometry=False, use_arrow=True)
+        reference = resolve_ili_join_key(table, gdf[main_key])
+        duplicates = table[reference].duplicated()
+        if duplicates.any():
+            # like a join in QGIS only the first matching feature is joined
+            print(f"Table {table_name}: {duplicates.sum()} additional features per point are not joined")
+        table = table[~duplicates].set_index(reference)
+        table = table.drop(columns=[field for field in ILI_KEY_FIELDS if field in table.columns])
+        gdf = gdf.join(table.add_prefix(f"{table_name}_"), on=main_key)
+    return gdf
+
+
+def resolve_ili_join_key(table, keys):
+    """Finds the field of a table that references the points (the field with the most values found in the keys).
 
-    for ili_file in ili_files:
-        print(f"Processing: {ili_file.stem}")
-        command = ("ogr2ogr -f" + " " + 'GPKG' + " " + "-a_srs 'EPSG:2056' " +
-                   str(os.path.join(gpkg_dir, ili_file.stem + ".gpkg")) + " " + str(ili_file))
-        print(f"Processing: {ili_file.stem}")
-        os.system(command, )
+    Args:
+        table (DataFrame): Table to join
+        keys (Series): Key values of the points
+
+    Returns:
+        string: Name of the reference field
+    """
+    unique_keys = keys.dropna().unique()
+    matches = {field: int(table[field].isin(unique_keys).sum()) for field in table.columns
+               if field not in ILI_KEY_FIELDS}
+    if not matches or max(matches.values()) == 0:
+        raise ValueError(f"No field of the table references the points (fields: {list(table.columns)})")
+    return max(matches, key=matches.get)
 
 
 def filter_df_column_names(gdf_column_list, filter):
@@ -66,432 +302,2845 @@ def unnest_list(filter_list):
     return (unnested)
 
 
-def list_to_string_for_df_indexing(in_list_el):
-    """Converts a list element to string for use in indexing of a (geo)pandas dataframe.
+def export_subset(gdf_subset, name, subset_dirs):
+    """Exports the subset of a canton as GPKG file to the canonical store (first subset folder) and links it into
+    the other subset folders.
 
     Args:
-        in_list_el (list): List element (e.g. column names of a (geo)pandas dataframe)
+        gdf_subset (GeoDataFrame): Subset of the canton
+        name (string): Name of the exported GPKG file (without suffix)
+        subset_dirs (list): List of folders (relative to the working directory) the subset is exported to
     """
-    list_el = ''.join(in_list_el)
-    return list_el
+    subset_path = os.path.join(os.getcwd(), subset_dirs[0], name + '.gpkg')
+    with stage_timer('subset write', name) as record:
+        write_subset_file(gdf_subset, subset_path)
+        record['rows'] = len(gdf_subset)
+        record['bytes_written'] = file_size(subset_path)
+    link_subset_file(name, subset_dirs)
 
 
-def calculate_statistics_from_ili_gpkg(gpkg_dir, excel_export_path):
-    """Calculates statistics for ILI converted GPKG file (compatible with ERKAS Strassen >V2_0)
+def temporary_path(path):
+    """Returns the path of the temporary file a file is written to before it replaces the file (same folder, so
+    that os.replace is atomic).
 
     Args:
-        gpkg_dir (string): Path to the folder location of the converted ILI_GPKG files (need to be in GPKG format)
-        excel_export_path (string): Path where the excel file containing the statistics is saved to
+        path (string): Path of the file
     """
-    import geopandas as gpd
-    import pandas as pd
+    return os.path.join(os.path.dirname(path), '.tmp_' + os.path.basename(path))
 
-    workingdir = os.getcwd()
-    gpkg_files = list_file_paths(gpkg_dir, '*.gpkg')
 
-    df_results = pd.DataFrame()
-    for gpkg_file in gpkg_files:
-        print(f"Processing: {gpkg_file.stem}")
+def write_subset_file(gdf_subset, subset_path):
+    """Writes a subset GPKG file in bulk (Arrow, batched transactions of GDAL) to a temporary file that replaces
+    the subset file, so that an interrupted write never leaves a partial subset.
 
-        # read in .gpkg file as a geodataframe
-        gdf = gpd.read_file(gpkg_file, crs="EPSG:2056")
-        gdf = gdf.set_crs("EPSG:2056", allow_override=True)
-        print(f"Number of points: {len(gdf.length)}")
-        print(f"Coordinate system: {gdf.crs}")
-        print(f"Number of columns (initial dataset): {len(gdf.columns)}")
-
-        # get variable for indexing
-        idlaenge = filter_df_column_names(list(gdf.columns), "IDLaenge")
-        kbfrei = filter_df_column_names(list(gdf.columns), "KBfrei")
-        ampelcodepers = filter_df_column_names(
-            list(gdf.columns), "Ergebnis_AmpelCodePers")
-        ampelcodeofg = filter_df_column_names(
-            list(gdf.columns), "Ergebnis_AmpelCodeOFG")
-        ampelcodegw = filter_df_column_names(
-            list(gdf.columns), "Ergebnis_AmpelCodeGW")
-        filter_list = idlaenge, kbfrei, ampelcodepers, ampelcodeofg, ampelcodegw
-        filter = unnest_list(filter_list)
-        filter.append('geometry')
-        canton_name_short = gpkg_file.stem.split('_')[-2]
+    Args:
+        gdf_subset (GeoDataFrame): Subset of the canton
+        subset_path (string): Path of the subset GPKG file (the layer has the name of the file)
+    """
+    from pathlib import Path
 
-        # create subset with columns needed for statistical analysis
-        gdf_subset = gdf[filter]
-        gdf_subset['Kanton'] = canton_name_short
-        gdf_subset['Format'] = "ILI_XTF"
-        file_format = "ILI_XTF"
-        unique_value_idlaenge = gdf_subset['IDLaenge'].unique()
-        if len(unique_value_idlaenge) == 1:
-            berechnungsintervall = gdf_subset['IDLaenge'][0]
-        else:
-            berechnungsintervall = "variabel"
-        gdf_subset['Berechnungsintervall'] = berechnungsintervall
-        cols = gdf_subset.columns.tolist()
-        cols = cols[-3:] + cols[:-3]
-        gdf_subset = gdf_subset[cols]
-        print(f"Columns of subset: {len(gdf_subset.columns)}")
-        if len(gdf_subset.columns) != 9:
-            print(
-                "Will not be analysed as used file has a geodatamodel with version <2_0 (Hint: check if field "
-                "IDLaenge exists in dataset")
-            print("___________________________________________________")
+    os.makedirs(os.path.dirname(subset_path), exist_ok=True)
+    temp_path = temporary_path(subset_path)
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    gdf_subset.to_file(temp_path, layer=Path(subset_path).stem, driver='GPKG', engine='pyogrio', use_arrow=True)
+    os.replace(temp_path, subset_path)
+
+
+def link_subset_file(name, subset_dirs):
+    """Provides the subset of the canonical store (first subset folder) in the other subset folders.
+
+    A hard link is created if possible, otherwise a symbolic link (e.g. another drive) and as last resort a copy
+    (e.g. file systems without links).
+
+    Args:
+        name (string): Name of the subset GPKG file (without suffix)
+        subset_dirs (list): List of folders (relative to the working directory) the subset is exported to
+    """
+    import shutil
+
+    subset_path = os.path.join(os.getcwd(), subset_dirs[0], name + '.gpkg')
+    for subset_dir in subset_dirs[1:]:
+        link_path = os.path.join(os.getcwd(), subset_dir, name + '.gpkg')
+        if os.path.abspath(link_path) == os.path.abspath(subset_path):
             continue
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        try:
+            os.link(subset_path, link_path)
+        except OSError:
+            try:
+                os.symlink(os.path.relpath(subset_path, os.path.dirname(link_path)), link_path)
+            except OSError:
+                shutil.copyfile(subset_path, link_path)
 
-        gdf_export_columns = ['Kanton', 'Format', 'Berechnungsintervall', 'IDLaenge', 'KBfrei', 'AmpelCodePers',
-                              'AmpelCodeOFG', 'AmpelCodeGW', 'geometry'
-                              ]
-        gdf_export = gdf_subset
-        gdf_export = gdf_export.set_axis(gdf_export_columns, axis=1)
-        if not os.path.exists(workingdir + '/Data/ILI_GPKG_EXPORT_SUBSET/'):
-            os.makedirs(os.path.join(workingdir + '/Data/ILI_GPKG_EXPORT_SUBSET/'))
-        gdf_export.to_file(os.path.join(
-            workingdir, 'Data/ILI_GPKG_EXPORT_SUBSET/' + gpkg_file.stem + '.gpkg'), driver='GPKG')
-        if not os.path.exists(workingdir + '/Data/RESULTS/GPKG_EXPORT_SUBSET/'):
-            os.makedirs(os.path.join(workingdir + '/Data/RESULTS/GPKG_EXPORT_SUBSET/'))
-        gdf_export.to_file(os.path.join(
-            workingdir, 'Data/RESULTS/GPKG_EXPORT_SUBSET/' + gpkg_file.stem + '.gpkg'), driver='GPKG')
-
-        # calculate total of kilometer Durchgangsstrasse
-        gdf_subset.IDLaenge = pd.to_numeric(gdf_subset.IDLaenge)
-        total = gdf_subset.IDLaenge.sum() / 1000
-        print(f"Total Durchgangsstrasse: {total} [km]")
-
-        # calculate total KB befreit
-        kbfrei_grouped = gdf_subset.groupby(
-            kbfrei)[idlaenge].sum().reset_index()
-        print(kbfrei_grouped)
-        kb_befreit = kbfrei_grouped[kbfrei_grouped[''.join(kbfrei)] == 'true']
-        kbfrei_grouped[kbfrei_grouped[''.join(kbfrei)] == 'true']
-        if kb_befreit.empty:
-            kb_befreit_calc = 0
-        else:
-            kb_befreit_calc = kb_befreit[idlaenge].values[0] / 1000
-        print(f"KB befreit: {kb_befreit_calc} km")
-
-        # calculate statistics for AmpelcodePers
-        ampelcodepers_grouped = gdf_subset.groupby(
-            ampelcodepers)[idlaenge].sum().reset_index()
-        ampelcodepers_calc = unnest_list(
-            ampelcodepers_grouped[idlaenge].values / 1000)
-        ampelcodepers_calc_classes = unnest_list(
-            ampelcodepers_grouped[ampelcodepers].astype(int).values)
-        ampelcodepers_dict = {ampelcodepers_calc_classes[i]: ampelcodepers_calc[i] for i in range(
-            len(ampelcodepers_calc_classes))}
-        ampelcodepers_dict = {
-            f"AmpelcodePers{key}": val for key, val in ampelcodepers_dict.items()}
-        beurteilt_pers = \
-            ampelcodepers_grouped[
-                (ampelcodepers_grouped[''.join(list_to_string_for_df_indexing(ampelcodepers))] == "1") | (
-                        ampelcodepers_grouped[''.join(list_to_string_for_df_indexing(ampelcodepers))] == "2") | (
-                        ampelcodepers_grouped[
-                            ''.join(list_to_string_for_df_indexing(ampelcodepers))] == "3") | (
-                        ampelcodepers_grouped[''.join(
-                            list_to_string_for_df_indexing(ampelcodepers))] == "4")].sum().values[
-                1] / 1000
-        zu_beurteilen_pers = total - kb_befreit_calc - beurteilt_pers
-        print(f"AmpelcodePers Classes: {ampelcodepers_calc_classes}")
-        print(f"AmpelcodePers Values: {ampelcodepers_calc}")
-        print(f"Beurteilt AmpelcodePers: {beurteilt_pers} km")
-        print(f"Zu beurteilen AmpelcodePers: {zu_beurteilen_pers} km")
-
-        # calculate statistics for AmpelcodeOFG
-        ampelcodeofg_grouped = gdf_subset.groupby(
-            ampelcodeofg)[idlaenge].sum().reset_index()
-        ampelcodeofg_calc = unnest_list(
-            ampelcodeofg_grouped[idlaenge].values / 1000)
-        ampelcodeofg_calc_classes = unnest_list(
-            ampelcodeofg_grouped[ampelcodeofg].astype(int).values)
-        ampelcodeofg_dict = {ampelcodeofg_calc_classes[i]: ampelcodeofg_calc[i] for i in range(
-            len(ampelcodeofg_calc_classes))}
-        ampelcodeofg_dict = {
-            f"AmpelcodeOFG{key}": val for key, val in ampelcodeofg_dict.items()}
-        beurteilt_ofg = \
-            ampelcodeofg_grouped[
-                (ampelcodeofg_grouped[''.join(list_to_string_for_df_indexing(ampelcodeofg))] == "1") | (
-                        ampelcodeofg_grouped[''.join(list_to_string_for_df_indexing(ampelcodeofg))] == "2") | (
-                        ampelcodeofg_grouped[
-                            ''.join(list_to_string_for_df_indexing(ampelcodeofg))] == "3") | (
-                        ampelcodeofg_grouped[''.join(
-                            list_to_string_for_df_indexing(ampelcodeofg))] == "4")].sum().values[
-                1] / 1000
-        zu_beurteilen_ofg = total - kb_befreit_calc - beurteilt_ofg
-        print(f"AmpelcodeOFG Classes: {ampelcodeofg_calc_classes}")
-        print(f"AmpelcodeOFG Values: {ampelcodeofg_calc}")
-        print(f"Beurteilt AmpelcodeOFG: {beurteilt_pers} km")
-        print(f"Zu beurteilen AmpelcodeOFG: {zu_beurteilen_ofg} km")
-
-        # calculate statistics for AmpelcodeGW
-        ampelcodegw_grouped = gdf_subset.groupby(
-            ampelcodegw)[idlaenge].sum().reset_index()
-        ampelcodegw_calc = unnest_list(
-            ampelcodegw_grouped[idlaenge].values / 1000)
-        ampelcodegw_calc_classes = unnest_list(
-            ampelcodegw_grouped[ampelcodegw].astype(int).values)
-        ampelcodegw_dict = {ampelcodegw_calc_classes[i]: ampelcodegw_calc[i] for i in range(
-            len(ampelcodegw_calc_classes))}
-        ampelcodegw_dict = {
-            f"AmpelcodeGW{key}": val for key, val in ampelcodegw_dict.items()}
-        beurteilt_gw = \
-            ampelcodegw_grouped[
-                (ampelcodegw_grouped[''.join(list_to_string_for_df_indexing(ampelcodegw))] == "1") | (
-                        ampelcodegw_grouped[''.join(list_to_string_for_df_indexing(ampelcodegw))] == "2") | (
-                        ampelcodegw_grouped[
-                            ''.join(list_to_string_for_df_indexing(ampelcodegw))] == "3") | (
-                        ampelcodegw_grouped[''.join(
-                            list_to_string_for_df_indexing(ampelcodegw))] == "4")].sum().values[
-                1] / 1000
-        zu_beurteilen_gw = total - kb_befreit_calc - beurteilt_gw
-        print(f"AmpelcodeGW Classes: {ampelcodegw_calc_classes}")
-        print(f"AmpelcodeGW Values: {ampelcodegw_calc}")
-        print(f"Beurteilt AmpelcodeGW: {beurteilt_pers} km")
-        print(f"Zu beurteilen AmpelcodeGW: {zu_beurteilen_gw} km")
-
-        # summarise statistical results in a dataframe (row)
-        df = pd.concat([pd.DataFrame([canton_name_short], columns=['Kanton']),
-                        pd.DataFrame([file_format], columns=['Format']),
-                        pd.DataFrame([berechnungsintervall], columns=['Berechnungsintervall [m]']),
-                        pd.DataFrame([total], columns=['Durchgangsstrasse [km]']),
-                        pd.DataFrame([kb_befreit_calc], columns=['KB-befreit [km]']),
-                        pd.DataFrame([zu_beurteilen_pers], columns=['Zu beurteilen AmpelcodePers [km]']),
-                        pd.DataFrame([beurteilt_pers], columns=['Beurteilt AmpelcodePers [km]']),
-                        ], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodepers_dict])], axis=1)
-        df = pd.concat([df, pd.DataFrame([zu_beurteilen_ofg], columns=['Zu beurteilen AmpelcodeOFG [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([beurteilt_ofg], columns=['Beurteilt AmpelcodeOFG [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodeofg_dict])], axis=1)
-        df = pd.concat([df, pd.DataFrame([zu_beurteilen_gw], columns=['Zu beurteilen AmpelcodeGW [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([beurteilt_gw], columns=['Beurteilt AmpelcodeGW [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodegw_dict])], axis=1)
-        df_results = pd.concat([df_results, df], axis=0)
-        print("___________________________________________________")
 
-    df_results
-    if not os.path.exists(os.path.join(workingdir, 'Data', 'RESULTS')):
-        os.makedirs(os.path.join(workingdir, 'Data', 'RESULTS'))
-    df_results.to_excel(excel_export_path, index=False)
+def subset_store_files(subset_dir):
+    """Returns the subset GPKG files of a subset folder (temporary files of unfinished writes are left out).
+
+    Args:
+        subset_dir (string): Path to the subset folder (e.g. the canonical store)
 
+    Returns:
+        list: Sorted list of paths to the subset GPKG files
+    """
+    return sorted(path for path in list_file_paths(subset_dir, "*.gpkg") if not path.name.startswith('.tmp_'))
 
-def calculate_statistics_from_xlsx_file(xlsx_dir, excel_export_path):
-    """Calculates statistics for ERKAS Excel files (compatible with ERKAS Strassen >V2_0)
+
+def file_content_hash(file_path):
+    """Calculates the SHA-256 hash of the content of a file.
 
     Args:
-        xlsx_dir (string): Path to the folder location of the Excel files (need to have a compatible header)
-        excel_export_path (string): Path where the excel file containing the statistics is saved to
+        file_path (string): Path to the file
+    """
+    import hashlib
+
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def code_version():
+    """Returns the version of the processing code (hash of this script) used to invalidate cached results."""
+    return file_content_hash(os.path.abspath(__file__))[:16]
+
+
+def write_cached_subset(gdf_subset, cache_dir, name):
+    """Stores the subset of a canton in the cache folder (GeoParquet).
+
+    Args:
+        gdf_subset (GeoDataFrame): Subset of the canton
+        cache_dir (string): Path to the cache folder
+        name (string): Name of the cached subset (without suffix)
+    """
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    # mixed object columns (e.g. text and numbers in the Excel files) can not be stored in parquet
+    object_columns = [column for column in gdf_subset.columns
+                      if column != 'geometry' and gdf_subset[column].dtype == object]
+    gdf_subset = gdf_subset.astype({column: 'string' for column in object_columns})
+    with stage_timer('cache write', name) as record:
+        gdf_subset.to_parquet(os.path.join(cache_dir, name + '.parquet'))
+        record['rows'] = len(gdf_subset)
+        record['bytes_written'] = file_size(os.path.join(cache_dir, name + '.parquet'))
+
+
+def load_cache_manifest(cache_dir):
+    """Loads the manifest of a cache folder, an empty manifest is returned if the code version changed.
+
+    Args:
+        cache_dir (string): Path to the cache folder
+    """
+    import json
+
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('code_version') == code_version():
+            return manifest
+        # results of another code version are stale
+        for entry in manifest.get('entries', {}).values():
+            remove_cache_entry(cache_dir, entry)
+    return {'code_version': code_version(), 'entries': {}}
+
+
+def save_cache_manifest(cache_dir, manifest):
+    """Saves the manifest of a cache folder (the manifest is replaced atomically).
+
+    Args:
+        cache_dir (string): Path to the cache folder
+        manifest (dict): Manifest of the cache folder
+    """
+    import json
+
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+
+def remove_cache_entry(cache_dir, entry):
+    """Deletes the cached subset of a manifest entry.
+
+    Args:
+        cache_dir (string): Path to the cache folder
+        entry (dict): Manifest entry
     """
+    if entry.get('subset') and os.path.exists(os.path.join(cache_dir, entry['subset'])):
+        os.remove(os.path.join(cache_dir, entry['subset']))
 
+
+def run_cached_per_canton(worker, files, cache_dir, subset_dirs, workers=1, export_subsets=True):
+    """Runs a worker function for each cantonal file that changed since the last run, the subsets of unchanged
+    files are loaded from the cache.
+
+    Files are identified by the hash of their content, a change of the processing code invalidates the whole cache.
+    Entries of files that changed or no longer exist are evicted, entries of files that are not part of the run are
+    kept.
+
+    Args:
+        worker (function): Function taking the path of one cantonal file and the keywords cache_dir and
+            export_subsets
+        files (list): List of paths to the cantonal files
+        cache_dir (string): Path to the cache folder (None: no caching)
+        subset_dirs (list): List of folders the subsets are exported to (missing exports and links are restored from
+            the cache)
+        workers (int): Number of worker processes (1: sequential, None: number of CPUs)
+        export_subsets (bool): Export the subsets as GPKG files (cached subsets without geometry are not used)
+
+    Returns:
+        tuple: List of subsets in the order of the files and list of (file, error message) tuples
+    """
+    from functools import partial
+    from pathlib import Path
+    import geopandas as gpd
     import pandas as pd
 
-    workingdir = os.getcwd()
-    xlsx_files = list_file_paths(xlsx_dir, "*.xlsx")
-    df_results = pd.DataFrame()
-
-    for xlsx_file in xlsx_files:
-        print(f"Processing: {xlsx_file}")
-        df = pd.read_excel(xlsx_file, skiprows=2)
-        header = df.iloc[0]
-        df.columns = header
-        df = df.drop(df.index[[0, 1, 2]])
-        df.reset_index(drop=True, inplace=True)
-        df = df.drop(df.columns[[0]], axis=1)
-
-        # create gdf from excel data
-        gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df.loc[:, 'Ort_E-Coord'], df.loc[:, 'Ort_N-Coord']))
-        gdf = gdf.set_crs('epsg:2056')
-        print(f"Number of points: {len(gdf.length)}")
-        print(f"Coordinate system: {gdf.crs}")
-        print(f"Number of columns (initial dataset): {len(gdf.columns)}")
-
-        if not os.path.exists(workingdir + '/Data/XLSX_GPKG_EXPORT_ALL/'):
-            os.makedirs(os.path.join(workingdir + '/Data/XLSX_GPKG_EXPORT_ALL/'))
-        # gdf.to_file(os.path.join(workingdir, 'Data/XLSX_GPKG_EXPORT_ALL/'+xlsx_file.stem+'.gpkg'), driver='GPKG')
-
-        filter_list = ['Inhaber', 'IDLaenge', 'KBfrei', 'AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW', 'geometry']
-        gdf_subset = gdf[filter_list]
-        canton_name_short = gdf_subset['Inhaber'].values[0]
-        gdf_subset = gdf_subset.drop(gdf_subset.columns[[0]], axis=1)
-        gdf_subset['Kanton'] = canton_name_short
-        gdf_subset['Format'] = "XLSX"
-        file_format = "XLSX"
-        unique_value_idlaenge = gdf_subset['IDLaenge'].unique()
-        if len(unique_value_idlaenge) == 1:
-            berechnungsintervall = gdf_subset['IDLaenge'][0]
+    if cache_dir is None:
+        return run_per_canton(partial(worker, export_subsets=export_subsets), files, workers=workers)
+
+    manifest = load_cache_manifest(cache_dir)
+    entries = manifest['entries']
+    file_hashes = {str(file): file_content_hash(file) for file in files}
+
+    # evict entries of changed or removed files and entries without geometry if the subsets are exported, entries of
+    # files that are not part of this run (e.g. other cantons) are kept
+    for key in list(entries):
+        if key in file_hashes:
+            stale = file_hashes[key] != entries[key]['hash'] or (export_subsets and not entries[key].get('geometry'))
         else:
-            berechnungsintervall = "variabel"
-        gdf_subset['Berechnungsintervall'] = berechnungsintervall
-        gdf_subset.drop(gdf_subset.columns[[0]], axis=1)
-        cols = gdf_subset.columns.tolist()
-        cols = cols[-3:] + cols[:-3]
-        gdf_subset = gdf_subset[cols]
-        print(f"Columns of subset: {len(gdf_subset.columns)}")
-        if len(gdf_subset.columns) != 9:
-            print(
-                "File will not be analysed as used file has a geodatamodel with version < V2_0 (Hint: check if field "
-                "IDLaenge exists in dataset")
-            print("___________________________________________________")
+            stale = not os.path.exists(key)
+        if stale:
+            remove_cache_entry(cache_dir, entries.pop(key))
+
+    changed_files = [file for file in files if str(file) not in entries]
+    print(f"Cache: {len(files) - len(changed_files)} unchanged, {len(changed_files)} new or changed file(s)")
+    changed_results, errors = run_per_canton(partial(worker, cache_dir=cache_dir, export_subsets=export_subsets),
+                                             changed_files, workers=workers)
+    failed_files = [str(file) for file, _ in errors]
+    for file, subset in zip(changed_files, changed_results):
+        if str(file) in failed_files:
             continue
-        if not os.path.exists(workingdir + '/Data/XLSX_GPKG_EXPORT_SUBSET/'):
-            os.makedirs(os.path.join(workingdir + '/Data/XLSX_GPKG_EXPORT_SUBSET/'))
-        gdf_subset.to_file(os.path.join(workingdir, 'Data/XLSX_GPKG_EXPORT_SUBSET/' + xlsx_file.stem + '.gpkg'),
-                           driver='GPKG')
-        if not os.path.exists(workingdir + '/Data/RESULTS/GPKG_EXPORT_SUBSET/'):
-            os.makedirs(os.path.join(workingdir + '/Data/RESULTS/GPKG_EXPORT_SUBSET/'))
-        gdf_subset.to_file(os.path.join(workingdir, 'Data/RESULTS/GPKG_EXPORT_SUBSET/' + xlsx_file.stem + '.gpkg'),
-                           driver='GPKG')
-
-        # calculate total of kilometer Durchgangsstrasse
-        total = gdf_subset.IDLaenge.sum() / 1000
-        print(f"Total Durchgangsstrasse: {total} [km]")
-
-        # calculate total KB befreit
-        kbfrei_grouped = gdf_subset.groupby('KBfrei')['IDLaenge'].sum().reset_index()
-        print(kbfrei_grouped)
-        kb_befreit = kbfrei_grouped[kbfrei_grouped['KBfrei'] == 'True']
-        if kb_befreit.empty:
-            kb_befreit_calc = 0
-        else:
-            kb_befreit_calc = kb_befreit.IDLaenge.values[0] / 1000
-        print(f"KB befreit: {kb_befreit_calc} km")
-
-        # calculate statistics for AmpelcodePers
-        ampelcodepers_grouped = gdf_subset.groupby(['AmpelCodePers'])['IDLaenge'].sum().reset_index()
-        ampelcodepers_calc = ampelcodepers_grouped['IDLaenge'].values / 1000
-        ampelcodepers_calc_classes = ampelcodepers_grouped['AmpelCodePers'].astype(int).values
-        ampelcodepers_dict = {ampelcodepers_calc_classes[i]: ampelcodepers_calc[i] for i in
-                              range(len(ampelcodepers_calc_classes))}
-        ampelcodepers_dict = {f"AmpelcodePers{key}": val for key, val in ampelcodepers_dict.items()}
-        beurteilt_pers = ampelcodepers_grouped[(ampelcodepers_grouped['AmpelCodePers'] == 1) |
-                                               (ampelcodepers_grouped['AmpelCodePers'] == 2) |
-                                               (ampelcodepers_grouped['AmpelCodePers'] == 3) |
-                                               (ampelcodepers_grouped['AmpelCodePers'] == 4)
-                         ].sum().values[1] / 1000
-        zu_beurteilen_pers = total - kb_befreit_calc - beurteilt_pers
-        print(f"AmpelcodePers Classes: {ampelcodepers_calc_classes}")
-        print(f"AmpelcodePers Values: {ampelcodepers_calc}")
-        print(f"Beurteilt AmpelcodePers: {beurteilt_pers} km")
-        print(f"Zu beurteilen AmpelcodePers: {zu_beurteilen_pers} km")
-
-        # calculate statistics for AmpelcodeOFG
-        ampelcodeofg_grouped = gdf_subset.groupby(['AmpelCodeOFG'])['IDLaenge'].sum().reset_index()
-        ampelcodeofg_calc = ampelcodeofg_grouped['IDLaenge'].values / 1000
-        ampelcodeofg_calc_classes = ampelcodeofg_grouped['AmpelCodeOFG'].astype(int).values
-        ampelcodeofg_dict = {ampelcodeofg_calc_classes[i]: ampelcodeofg_calc[i] for i in
-                              range(len(ampelcodeofg_calc_classes))}
-        ampelcodeofg_dict = {f"AmpelcodeOFG{key}": val for key, val in ampelcodeofg_dict.items()}
-        beurteilt_ofg = ampelcodeofg_grouped[(ampelcodeofg_grouped['AmpelCodeOFG'] == 1) |
-                                               (ampelcodeofg_grouped['AmpelCodeOFG'] == 2) |
-                                               (ampelcodeofg_grouped['AmpelCodeOFG'] == 3) |
-                                               (ampelcodeofg_grouped['AmpelCodeOFG'] == 4)
-                         ].sum().values[1] / 1000
-        zu_beurteilen_ofg = total - kb_befreit_calc - beurteilt_ofg
-        print(f"AmpelcodeOFG Classes: {ampelcodeofg_calc_classes}")
-        print(f"AmpelcodeOFG Values: {ampelcodeofg_calc}")
-        print(f"Beurteilt AmpelcodeoOFG: {beurteilt_ofg} km")
-        print(f"Zu beurteilen AmpelcodeOFG: {zu_beurteilen_ofg} km")
-
-        # calculate statistics for AmpelcodeGW
-        ampelcodegw_grouped = gdf_subset.groupby(['AmpelCodeGW'])['IDLaenge'].sum().reset_index()
-        ampelcodegw_calc = ampelcodegw_grouped['IDLaenge'].values / 1000
-        ampelcodegw_calc_classes = ampelcodegw_grouped['AmpelCodeGW'].astype(int).values
-        ampelcodegw_dict = {ampelcodegw_calc_classes[i]: ampelcodegw_calc[i] for i in
-                              range(len(ampelcodegw_calc_classes))}
-        ampelcodegw_dict = {f"AmpelcodeGW{key}": val for key, val in ampelcodegw_dict.items()}
-        beurteilt_gw = ampelcodegw_grouped[(ampelcodegw_grouped['AmpelCodeGW'] == 1) |
-                                               (ampelcodegw_grouped['AmpelCodeGW'] == 2) |
-                                               (ampelcodegw_grouped['AmpelCodeGW'] == 3) |
-                                               (ampelcodegw_grouped['AmpelCodeGW'] == 4)
-                         ].sum().values[1] / 1000
-        zu_beurteilen_gw = total - kb_befreit_calc - beurteilt_gw
-        print(f"AmpelcodeGW Classes: {ampelcodegw_calc_classes}")
-        print(f"AmpelcodeGW Values: {ampelcodegw_calc}")
-        print(f"Beurteilt AmpelcodeoGW: {beurteilt_gw} km")
-        print(f"Zu beurteilen AmpelcodeGW: {zu_beurteilen_gw} km")
-
-        # summarise statistical results in a dataframe (row)
-        df = pd.concat([pd.DataFrame([canton_name_short], columns=['Kanton']),
-                        pd.DataFrame([file_format], columns=['Format']),
-                        pd.DataFrame([berechnungsintervall], columns=['Berechnungsintervall [m]']),
-                        pd.DataFrame([total], columns=['Durchgangsstrasse [km]']),
-                        pd.DataFrame([kb_befreit_calc], columns=['KB-befreit [km]']),
-                        pd.DataFrame([zu_beurteilen_pers], columns=['Zu beurteilen AmpelcodePers [km]']),
-                        pd.DataFrame([beurteilt_pers], columns=['Beurteilt AmpelcodePers [km]']),
-                        ], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodepers_dict])], axis=1)
-        df = pd.concat([df, pd.DataFrame([zu_beurteilen_ofg], columns=['Zu beurteilen AmpelcodeOFG [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([beurteilt_ofg], columns=['Beurteilt AmpelcodeOFG [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodeofg_dict])], axis=1)
-        df = pd.concat([df, pd.DataFrame([zu_beurteilen_gw], columns=['Zu beurteilen AmpelcodeGW [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([beurteilt_gw], columns=['Beurteilt AmpelcodeGW [km]'])], axis=1)
-        df = pd.concat([df, pd.DataFrame([ampelcodegw_dict])], axis=1)
-        df_results = pd.concat([df_results, df], axis=0)
-        print("___________________________________________________")
+        entries[str(file)] = {'hash': file_hashes[str(file)], 'geometry': export_subsets,
+                              'subset': None if subset is None else Path(file).stem + '.parquet'}
+    save_cache_manifest(cache_dir, manifest)
+
+    changed_results = dict(zip([str(file) for file in changed_files], changed_results))
+    results = []
+    for file in files:
+        if str(file) in changed_results:
+            results.append(changed_results[str(file)])
+            continue
+        entry = entries[str(file)]
+        if entry['subset'] is None:
+            results.append(None)
+            continue
+        subset_path = os.path.join(cache_dir, entry['subset'])
+        missing_exports = [subset_dir for subset_dir in subset_dirs if export_subsets
+                           and not os.path.exists(os.path.join(subset_dir, Path(file).stem + '.gpkg'))]
+        if subset_dirs[0] in missing_exports:
+            export_subset(gpd.read_parquet(subset_path), Path(file).stem, subset_dirs)
+        elif missing_exports:
+            link_subset_file(Path(file).stem, subset_dirs)
+        with stage_timer('cache read', Path(file).stem) as record:
+            results.append(pd.read_parquet(subset_path, columns=SUBSET_COLUMNS[:-1]))
+            record['rows'] = len(results[-1])
+            record['bytes_read'] = file_size(subset_path)
+    return results, errors
+
+
+def file_size(path):
+    """Returns the size of a file in bytes (0 if the file does not exist).
+
+    Args:
+        path (string): Path to the file
+    """
+    return os.path.getsize(path) if os.path.exists(path) else 0
 
-    if not os.path.exists(os.path.join(workingdir, 'Data', 'RESULTS')):
-        os.makedirs(os.path.join(workingdir, 'Data', 'RESULTS'))
-    df_results.to_excel(excel_export_path, index=False)
 
+@contextmanager
+def stage_timer(stage, canton=None):
+    """Measures the time and peak memory of a processing stage and adds a record to STAGE_RECORDS.
 
-def combine_results_xlsx(result_files, excel_export_path):
-    """Combine excel files in a directory into one and sort them according to predefined colum order
+    The peak memory is only measured if tracemalloc is tracing (see main). The peak of tracemalloc is reset for each
+    timer, the peak reached so far is passed to the open outer timers first (see OPEN_TIMER_PEAKS), so that the peak
+    of an outer timer includes the peaks of its inner timers. The yielded record can be updated with the number of
+    rows and the bytes read and written by the stage.
 
     Args:
-        result_files (List): List containing the paths to the Excel files to combine
-        excel_export_path (string): Path where the excel file containing the statistics is saved to
+        stage (string): Name of the stage (e.g. read, normalize, subset write, aggregate, combine)
+        canton (string): Name of the canton or file the stage processes (None: all cantons)
+    """
+    import time
+    import tracemalloc
+
+    record = {'stage': stage, 'canton': canton, 'rows': None, 'bytes_read': None, 'bytes_written': None,
+              'pid': os.getpid()}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        pass_peak_to_open_timers(tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        peak = [start_memory]
+        OPEN_TIMER_PEAKS.append(peak)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        record['peak_memory_mb'] = None
+        if tracing:
+            # timers of generators are not always closed in the order they were opened
+            OPEN_TIMER_PEAKS[:] = [open_peak for open_peak in OPEN_TIMER_PEAKS if open_peak is not peak]
+            if tracemalloc.is_tracing():
+                peak[0] = max(peak[0], tracemalloc.get_traced_memory()[1])
+                pass_peak_to_open_timers(peak[0])
+            record['peak_memory_mb'] = (peak[0] - start_memory) / 1e6
+        STAGE_RECORDS.append(record)
+
+
+def pass_peak_to_open_timers(peak):
+    """Raises the peak memory of the open stage timers to a peak reached inside of them (see stage_timer).
+
+    Args:
+        peak (int): Peak of the traced memory in bytes
+    """
+    for open_peak in OPEN_TIMER_PEAKS:
+        open_peak[0] = max(open_peak[0], peak)
+
+
+def run_with_stage_records(worker, file, track_memory=False):
+    """Runs a worker function for one file and returns the stage records it created (used for worker processes).
+
+    Args:
+        worker (function): Function taking the path of one cantonal file
+        file (Path): Path to the cantonal file
+        track_memory (bool): Start tracemalloc to measure the peak memory of the stages
+
+    Returns:
+        tuple: Result of the worker function and list of stage records
+    """
+    import tracemalloc
+
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    start = len(STAGE_RECORDS)
+    try:
+        result = worker(file)
+    finally:
+        records = STAGE_RECORDS[start:]
+        del STAGE_RECORDS[start:]
+    return result, records
+
+
+def summarize_stage_records(records):
+    """Summarizes stage records per stage.
+
+    Args:
+        records (list): List of stage records
+
+    Returns:
+        list: Totals per stage (seconds, count, rows, bytes read and written, peak memory) sorted by seconds
+    """
+    stages = {}
+    for record in records:
+        summary = stages.setdefault(record['stage'], {'stage': record['stage'], 'seconds': 0, 'count': 0, 'rows': 0,
+                                                      'bytes_read': 0, 'bytes_written': 0, 'peak_memory_mb': None})
+        summary['seconds'] += record['seconds']
+        summary['count'] += 1
+        for key in ('rows', 'bytes_read', 'bytes_written'):
+            summary[key] += record[key] or 0
+        if record['peak_memory_mb'] is not None:
+            summary['peak_memory_mb'] = max(summary['peak_memory_mb'] or 0, record['peak_memory_mb'])
+    return sorted(stages.values(), key=lambda summary: summary['seconds'], reverse=True)
+
+
+def write_run_report(report_path, profile_path=None, top=10):
+    """Writes the stage records of the run as JSON report and prints a summary of the hot spots (the records of the
+    processing steps, without the records of the pipeline stages and the whole run).
+
+    Args:
+        report_path (string): Path of the JSON report
+        profile_path (string): Path of the cProfile output of the run (None: no profile)
+        top (int): Number of hot spots in the summary
+    """
+    import json
+
+    try:
+        import resource
+        # peak resident memory of the main process (kilobytes on Linux)
+        max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+    except ImportError:
+        # not available on Windows
+        max_rss_mb = None
+
+    report = {
+        'stages': summarize_stage_records(STAGE_RECORDS),
+        'hot_spots': sorted([record for record in STAGE_RECORDS if record['stage'] != 'total'
+                             and not record['stage'].startswith(PIPELINE_RECORD_PREFIX)],
+                            key=lambda record: record['seconds'], reverse=True)[:top],
+        'records': STAGE_RECORDS,
+        'max_rss_mb': max_rss_mb,
+        'profile': profile_path,
+    }
+    if os.path.dirname(report_path) and not os.path.exists(os.path.dirname(report_path)):
+        os.makedirs(os.path.dirname(report_path))
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print("Stages:")
+    for summary in report['stages']:
+        print(f"  {summary['stage']}: {summary['seconds']:.2f} s ({summary['count']}x, {summary['rows']} rows, "
+              f"{summary['bytes_read'] / 1e6:.1f} MB read, {summary['bytes_written'] / 1e6:.1f} MB written)")
+    print("Hot spots:")
+    for record in report['hot_spots']:
+        memory = '' if record['peak_memory_mb'] is None else f", {record['peak_memory_mb']:.1f} MB peak"
+        canton = '' if record['canton'] is None else f" {record['canton']}"
+        print(f"  {record['stage']}{canton}: {record['seconds']:.2f} s{memory}")
+    print(f"Run report: {report_path}")
+
+
+def run_per_canton(worker, files, workers=1):
+    """Runs a worker function for each cantonal file, either sequentially or in a process pool.
+
+    Args:
+        worker (function): Function taking the path of one cantonal file (needs to be defined at module level)
+        files (list): List of paths to the cantonal files
+        workers (int): Number of worker processes (1: sequential, None: number of CPUs)
+
+    Returns:
+        tuple: List of results in the order of the files (None for failed files) and list of (file, error message)
+        tuples
+    """
+    import tracemalloc
+    from concurrent.futures import ProcessPoolExecutor
+
+    results = []
+    errors = []
+    if workers == 1 or len(files) <= 1:
+        for file in files:
+            try:
+                result, records = run_with_stage_records(worker, file)
+                STAGE_RECORDS.extend(records)
+                results.append(result)
+            except Exception as e:
+                print(f"Failed: {file} ({type(e).__name__}: {e})")
+                results.append(None)
+                errors.append((file, f"{type(e).__name__}: {e}"))
+        return results, errors
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_with_stage_records, worker, file, tracemalloc.is_tracing()) for file in files]
+        # collect the results in the order of the files to get a deterministic canton order
+        for file, future in zip(files, futures):
+            try:
+                result, records = future.result()
+                STAGE_RECORDS.extend(records)
+                results.append(result)
+            except Exception as e:
+                print(f"Failed: {file} ({type(e).__name__}: {e})")
+                results.append(None)
+                errors.append((file, f"{type(e).__name__}: {e}"))
+    return results, errors
+
+
+def print_error_summary(errors):
+    """Prints a summary of the files that could not be processed.
+
+    Args:
+        errors (list): List of (file, error message) tuples as returned by run_per_canton
+    """
+    if not errors:
+        return
+    print(f"{len(errors)} file(s) could not be processed:")
+    for file, message in errors:
+        print(f"  {file}: {message}")
+    print("___________________________________________________")
+
+
+def length_value(length):
+    """Returns a float32 length as the shortest number that represents it (e.g. 10 instead of 10.0).
+
+    Args:
+        length (float): Length in meters
+    """
+    import numpy as np
+
+    value = float(np.format_float_positional(np.float32(length), trim='-'))
+    return int(value) if value.is_integer() else value
+
+
+def normalize_subset(df, canton, file_format):
+    """Converts the fields of a cantonal file to the normalized subset schema (see SUBSET_DTYPES).
+
+    Kanton, Format and Berechnungsintervall are categories, IDLaenge is a float32 length in meters, KBfrei a
+    boolean (True for all values written as true in any case) and the Ampelcodes are small integers (values that
+    are not numbers are missing).
+
+    Args:
+        df (DataFrame): Fields IDLaenge, KBfrei and AmpelCodes of the file (and geometry)
+        canton (string): Abbreviation of the canton
+        file_format (string): Format of the file (ILI_XTF or XLSX)
+
+    Returns:
+        DataFrame: Subset with the columns of SUBSET_COLUMNS (geometry only if df has a geometry)
     """
+    import numpy as np
     import pandas as pd
 
-    excl_list = []
-    for file in result_files:
-        excl_list.append(pd.read_excel(file))
-    excl_merged = pd.DataFrame()
-    for excl_file in excl_list:
-        # appends the data into the excl_merged
-        # dataframe.
-        excl_merged = excl_merged.append(excl_file, ignore_index=True)
-    # sort columns
-    columns_sorted = ['Kanton', 'Format', 'Berechnungsintervall [m]', 'Durchgangsstrasse [km]', 'KB-befreit [km]',
-     'Zu beurteilen AmpelcodePers [km]', 'Beurteilt AmpelcodePers [km]', 'AmpelcodePers0', 'AmpelcodePers1',
-     'AmpelcodePers2', 'AmpelcodePers3', 'AmpelcodePers4', 'AmpelcodePers5', 'Zu beurteilen AmpelcodeOFG [km]',
-     'Beurteilt AmpelcodeOFG [km]', 'AmpelcodeOFG0', 'AmpelcodeOFG1', 'AmpelcodeOFG2', 'AmpelcodeOFG3', 'AmpelcodeOFG4',
-     'AmpelcodeOFG5', 'Zu beurteilen AmpelcodeGW [km]', 'Beurteilt AmpelcodeGW [km]', 'AmpelcodeGW0', 'AmpelcodeGW1',
-     'AmpelcodeGW2', 'AmpelcodeGW3', 'AmpelcodeGW4', 'AmpelcodeGW5']
-    excl_merged = excl_merged.reindex(columns = columns_sorted)
-    excl_merged.to_excel(excel_export_path, index=False)
-
-
-def combine_gpkgs(gpkg_result_dir, gpkg_out_path):
-    """Combines mutiple geopackage into one dataset (.gpkgs need to have the same structure)
+    length = pd.to_numeric(df['IDLaenge'], errors='coerce').astype('float32')
+    unique_lengths = length.dropna().unique()
+    if len(unique_lengths) == 1:
+        berechnungsintervall = str(length_value(unique_lengths[0]))
+    else:
+        berechnungsintervall = "variabel"
+
+    codes = np.zeros(len(df), dtype='int8')
+    columns = {
+        'Kanton': pd.Categorical.from_codes(codes, [canton]),
+        'Format': pd.Categorical.from_codes(codes, [file_format]),
+        'Berechnungsintervall': pd.Categorical.from_codes(codes, [berechnungsintervall]),
+        'IDLaenge': length.to_numpy(),
+        'KBfrei': (df['KBfrei'].astype(str).str.lower() == 'true').to_numpy(),
+    }
+    for code in AMPELCODE_COLUMNS:
+        # classes are truncated to integers, values that are not numbers or out of range are missing
+        classes = np.trunc(pd.to_numeric(df[code], errors='coerce').astype('float64'))
+        columns[code] = classes.where(classes.between(0, 127)).astype('Int8').array
+    subset = pd.DataFrame(columns, index=df.index)
+    if 'geometry' in df.columns:
+        import geopandas as gpd
+        subset = gpd.GeoDataFrame(subset, geometry=df.geometry, crs=df.crs)
+    return subset
+
+
+def concat_subsets(results):
+    """Concatenates the subsets of the cantons into one point table.
+
+    The categories of the categorical columns are combined so that the point table keeps the normalized schema.
 
-        Args:
-            gpkg_results_dir (string): Path to the folder location of the GPKG files to merge
+    Args:
+        results (list): List of subsets (DataFrame or None for files that were not analysed)
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    subsets = [subset for subset in results if subset is not None]
+    if not subsets:
+        return pd.DataFrame(columns=SUBSET_COLUMNS[:-1]).astype(SUBSET_DTYPES)
+    for column in [column for column, dtype in SUBSET_DTYPES.items() if dtype == 'category']:
+        categories = union_categoricals([subset[column] for subset in subsets]).categories
+        subsets = [subset.assign(**{column: subset[column].cat.set_categories(categories)}) for subset in subsets]
+    return pd.concat(subsets, axis=0, ignore_index=True)
+
+
+def calculate_ampelcode_statistics(points, keys=RESULT_KEYS):
+    """Calculates the statistics of all cantons in one pass over the point table.
+
+    The lengths of all three Ampelcodes are aggregated together by melting the Ampelcode fields into one column
+    and pivoting the sums per canton, Ampelcode and class (see partial_ampelcode_statistics).
+
+    Args:
+        points (DataFrame): Point table in the normalized subset schema (Kanton, Format, IDLaenge, KBfrei and
+            AmpelCodes, see SUBSET_DTYPES)
+        keys (list): Columns of the point table the statistics are grouped by (e.g. a region, see
+            calculate_regional_statistics)
+
+    Returns:
+        DataFrame: Statistics with one row per canton and format, columns sorted according to RESULT_COLUMNS
+    """
+    return finalize_ampelcode_statistics(merge_partial_statistics([partial_ampelcode_statistics(points, keys)], keys),
+                                         keys)
+
+
+def partial_ampelcode_statistics(points, keys=RESULT_KEYS):
+    """Aggregates a point table (e.g. one batch of a cantonal file) to partial statistics.
+
+    The lengths are summed as integer millimeters, so that merging the partial statistics of batches gives exactly
+    the same statistics as aggregating the whole point table.
+
+    Args:
+        points (DataFrame): Point table in the normalized subset schema (see SUBSET_DTYPES)
+        keys (list): Columns of the point table the statistics are grouped by
+
+    Returns:
+        DataFrame: One row per canton and format with the length sums in millimeters (IDLaenge, KBbefreit and one
+            column per Ampelcode and class, e.g. AmpelCodePers1) and the first, minimum and maximum length
+    """
+    import pandas as pd
+
+    millimeters = (points['IDLaenge'].astype('float64') * 1000).round().fillna(0).astype('int64')
+    table = points[keys].assign(IDLaenge=millimeters, KBbefreit=millimeters.where(points['KBfrei'], 0),
+                                Laenge=points['IDLaenge'])
+    grouped = table.groupby(keys, sort=False, observed=True)
+    partial = pd.DataFrame({
+        'IDLaenge': grouped['IDLaenge'].sum(),
+        'KBbefreit': grouped['KBbefreit'].sum(),
+        'first': grouped['Laenge'].first(),
+        'min': grouped['Laenge'].min(),
+        'max': grouped['Laenge'].max(),
+    })
+
+    # sum the lengths per class for all Ampelcodes at once
+    melted = points[keys + AMPELCODE_COLUMNS].assign(IDLaenge=millimeters).melt(
+        id_vars=keys + ['IDLaenge'], value_vars=AMPELCODE_COLUMNS, var_name='Ampelcode', value_name='Klasse')
+    melted = melted.dropna(subset=['Klasse'])
+    classes = melted.groupby(keys + ['Ampelcode', 'Klasse'], observed=True)['IDLaenge'].sum()
+    classes = classes.unstack(['Ampelcode', 'Klasse'])
+    classes.columns = [f"{code}{klasse}" for code, klasse in classes.columns]
+    return partial.join(classes).reset_index()
+
+
+def merge_partial_statistics(partials, keys=RESULT_KEYS):
+    """Merges partial statistics (see partial_ampelcode_statistics), e.g. of the batches of a cantonal file or of
+    all cantons.
+
+    Args:
+        partials (list): List of partial statistics (None for files that were not analysed)
+        keys (list): Key columns of the partial statistics
+
+    Returns:
+        DataFrame: Partial statistics with one row per canton and format
+    """
+    import pandas as pd
+
+    partials = [partial for partial in partials if partial is not None]
+    if not partials:
+        # same dtypes as the partial statistics of an empty point table
+        return pd.DataFrame(columns=keys + PARTIAL_COLUMNS).astype(
+            {'IDLaenge': 'int64', 'KBbefreit': 'int64', 'first': 'float32', 'min': 'float32', 'max': 'float32'})
+    merged = pd.concat(partials, ignore_index=True)
+    class_columns = [column for column in merged.columns if column not in keys + PARTIAL_COLUMNS]
+    grouped = merged.groupby(keys, sort=False, observed=True)
+    return pd.concat([
+        grouped[['IDLaenge', 'KBbefreit']].sum(),
+        grouped['first'].first(),
+        grouped['min'].min(),
+        grouped['max'].max(),
+        # classes without points in a canton stay empty
+        grouped[class_columns].sum(min_count=1),
+    ], axis=1).reset_index()
+
+
+def finalize_ampelcode_statistics(partial, keys=RESULT_KEYS):
+    """Calculates the statistics from merged partial statistics (see merge_partial_statistics).
+
+    Args:
+        partial (DataFrame): Partial statistics with one row per canton and format
+        keys (list): Key columns of the partial statistics (they replace Kanton and Format in the result columns)
+
+    Returns:
+        DataFrame: Statistics with one row per canton and format, columns sorted according to RESULT_COLUMNS
     """
     import pandas as pd
+
+    # the keys are text, whether the partial statistics were merged from one or several point tables
+    partial = partial.astype({key: str for key in keys}).set_index(keys)
+
+    # calculate total of kilometer Durchgangsstrasse and KB befreit
+    results = pd.DataFrame({
+        'Durchgangsstrasse [km]': partial['IDLaenge'] / 1e6,
+        'KB-befreit [km]': partial['KBbefreit'] / 1e6,
+    })
+
+    # Berechnungsintervall is the length of the points if it is the same for all points of the canton, the column
+    # holds numbers and text (variabel) and has the same dtype whether there are rows or not
+    results.insert(0, 'Berechnungsintervall [m]',
+                   partial['first'].map(length_value).astype(object).where(partial['min'] == partial['max'],
+                                                                           'variabel'))
+
+    for code in AMPELCODE_COLUMNS:
+        name = code.replace('AmpelCode', 'Ampelcode')
+        beurteilt_columns = [f"{code}{klasse}" for klasse in AMPELCODE_CLASSES_BEURTEILT
+                             if f"{code}{klasse}" in partial.columns]
+        beurteilt = partial[beurteilt_columns].sum(axis=1) / 1e6
+        results[f"Beurteilt {name} [km]"] = beurteilt
+        results[f"Zu beurteilen {name} [km]"] = (results['Durchgangsstrasse [km]'] - results['KB-befreit [km]']
+                                                  - beurteilt)
+    classes = partial.drop(columns=PARTIAL_COLUMNS) / 1e6
+    classes.columns = [column.replace('AmpelCode', 'Ampelcode') for column in classes.columns]
+    results = results.join(classes)
+    return results.reset_index().reindex(columns=keys + RESULT_COLUMNS[len(RESULT_KEYS):])
+
+
+def aggregate_subset_chunks(chunks, name, subset_dirs, export_subsets=True):
+    """Aggregates the subset of a canton batch by batch to partial statistics and writes the subset GPKG file
+    incrementally (chunked mode, the memory use is bounded by the batch size).
+
+    The subset is written to a temporary file that replaces the file of the canonical store (first subset folder),
+    the other subset folders get links (see link_subset_file). The Berechnungsintervall of the exported subset is the
+    one of the first batch. If a later batch has another length, the written file is streamed once more to set the
+    Berechnungsintervall to variabel.
+
+    Args:
+        chunks (iterator): Batches of the subset as tuples of a DataFrame in the normalized subset schema (without
+            geometry) and the WKB geometries of the points (None if export_subsets is False)
+        name (string): Name of the exported GPKG file (without suffix)
+        subset_dirs (list): List of folders (relative to the working directory) the subset is exported to
+        export_subsets (bool): Export the subset as GPKG file
+
+    Returns:
+        DataFrame: Partial statistics of the canton (see partial_ampelcode_statistics)
+    """
+    import pyarrow as pa
+    import pyogrio
+
+    partial = None
+    written_interval = None
+    rows = 0
+
+    def batches():
+        nonlocal partial, written_interval, rows
+        for subset, geometries in chunks:
+            if len(subset) == 0:
+                continue
+            rows += len(subset)
+            partial = merge_partial_statistics([partial, partial_ampelcode_statistics(subset)])
+            if not export_subsets:
+                continue
+            if written_interval is None:
+                written_interval = subset['Berechnungsintervall'].iloc[0]
+            yield subset_record_batch(subset.assign(Berechnungsintervall=written_interval), geometries)
+
+    with stage_timer('chunked', name) as record:
+        if not export_subsets:
+            for batch in batches():
+                pass
+        else:
+            subset_path = os.path.join(os.getcwd(), subset_dirs[0], name + '.gpkg')
+            temp_path = temporary_path(subset_path)
+            os.makedirs(os.path.dirname(subset_path), exist_ok=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            # writing all batches in one session lets GDAL build the spatial index once at the end
+            pyogrio.write_arrow(pa.RecordBatchReader.from_batches(subset_arrow_schema(), batches()), temp_path,
+                                layer=name, driver='GPKG', geometry_name='geometry', geometry_type='Point',
+                                crs='EPSG:2056', layer_options={'SPATIAL_INDEX': 'YES'})
+            os.replace(temp_path, subset_path)
+            if partial is not None:
+                interval = finalize_ampelcode_statistics(partial)['Berechnungsintervall [m]'].iloc[0]
+                if str(interval) != written_interval:
+                    rewrite_subset_interval(subset_path, str(interval))
+            link_subset_file(name, subset_dirs)
+            record['bytes_written'] = file_size(subset_path)
+        record['rows'] = rows
+    return partial
+
+
+def subset_arrow_schema():
+    """Returns the Arrow schema of the subsets exported in chunked mode (same field types as the subsets exported
+    with GeoDataFrame.to_file)."""
+    import pyarrow as pa
+
+    return pa.schema([('Kanton', pa.string()), ('Format', pa.string()), ('Berechnungsintervall', pa.string()),
+                      ('IDLaenge', pa.float32()), ('KBfrei', pa.bool_()), ('AmpelCodePers', pa.int16()),
+                      ('AmpelCodeOFG', pa.int16()), ('AmpelCodeGW', pa.int16()), ('geometry', pa.binary())])
+
+
+def subset_record_batch(subset, geometries):
+    """Converts a batch of a subset to an Arrow record batch with the field types of the exported subsets.
+
+    Args:
+        subset (DataFrame): Batch of the subset in the normalized subset schema (without geometry)
+        geometries (Array): WKB geometries of the points
+
+    Returns:
+        RecordBatch: Batch with the schema of subset_arrow_schema
+    """
+    import pyarrow as pa
+
+    schema = subset_arrow_schema()
+    arrays = []
+    for field in schema:
+        if field.name == 'geometry':
+            arrays.append(pa.array(geometries, type=field.type))
+        elif field.type == pa.string():
+            arrays.append(pa.array(subset[field.name].astype(str).to_numpy(), type=field.type))
+        else:
+            arrays.append(pa.array(subset[field.name], type=field.type, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def rewrite_subset_interval(subset_path, interval):
+    """Sets the Berechnungsintervall of all points of an exported subset GPKG file (streamed through a temporary
+    file that replaces the subset file).
+
+    Args:
+        subset_path (string): Path to the subset GPKG file
+        interval (string): Berechnungsintervall of the canton
+    """
+    import pyarrow as pa
+    import pyogrio
+    from pathlib import Path
+    from pyogrio.raw import open_arrow
+
+    temp_path = temporary_path(subset_path)
+
+    def batches(reader):
+        for batch in reader:
+            index = batch.schema.get_field_index('Berechnungsintervall')
+            yield batch.set_column(index, 'Berechnungsintervall', pa.array([interval] * batch.num_rows))
+
+    with open_arrow(subset_path, use_pyarrow=True) as (meta, reader):
+        pyogrio.write_arrow(pa.RecordBatchReader.from_batches(reader.schema, batches(reader)), temp_path,
+                            layer=Path(subset_path).stem, driver='GPKG',
+                            geometry_name=meta['geometry_name'] or 'wkb_geometry', geometry_type='Point',
+                            crs='EPSG:2056', layer_options={'SPATIAL_INDEX': 'YES'})
+    os.replace(temp_path, subset_path)
+
+
+def resolve_ili_gpkg_columns(field_names):
+    """Resolves the fields of an ILI converted GPKG file needed for the statistics.
+
+    Args:
+        field_names (list): List of field names of the GPKG layer
+
+    Returns:
+        list: Field names in the order of ILI_COLUMN_FILTERS or None if a field is missing or ambiguous
+    """
+    columns = [filter_df_column_names(field_names, column_filter) for column_filter in ILI_COLUMN_FILTERS]
+    if any(len(column) != 1 for column in columns):
+        return None
+    return unnest_list(columns)
+
+
+def read_ili_gpkg(gpkg_file, read_geometry=True):
+    """Reads the fields needed for the statistics from an ILI converted GPKG file.
+
+    Only the layer schema is read to resolve the fields, the projection of the fields is then pushed down into an
+    Arrow based read so that the other attributes of the joined tables are never loaded.
+
+    Args:
+        gpkg_file (Path): Path to the converted ILI_GPKG file
+        read_geometry (bool): Read the geometry of the points (not needed for the statistics)
+
+    Returns:
+        GeoDataFrame: Fields IDLaenge, KBfrei and AmpelCodes (and geometry) or None if the file is not compatible
+    """
     import geopandas as gpd
-    gpkg_result_files = list_file_paths(gpkg_result_dir, "*.gpkg")
-    gdf = gpd.GeoDataFrame(pd.concat([gpd.read_file(i) for i in gpkg_result_files],
-                                     ignore_index=True), crs=gpd.read_file(gpkg_result_files[0]).crs)
-    gdf.to_file(gpkg_out_path, driver='GPKG')
+    import pyogrio
+
+    info = pyogrio.read_info(gpkg_file)
+    print(f"Number of points: {info['features']}")
+    print(f"Number of columns (initial dataset): {len(info['fields'])}")
+    columns = resolve_ili_gpkg_columns(list(info['fields']))
+    if columns is None:
+        return None
+
+    with stage_timer('read', gpkg_file.stem) as record:
+        gdf = gpd.read_file(gpkg_file, engine='pyogrio', columns=columns, ignore_geometry=not read_geometry,
+                            use_arrow=True)
+        record['rows'] = len(gdf)
+        record['bytes_read'] = file_size(gpkg_file)
+    gdf = gdf[columns + (['geometry'] if read_geometry else [])]
+    gdf.columns = SUBSET_COLUMNS[3:3 + len(gdf.columns)]
+    if read_geometry:
+        gdf = gdf.set_crs("EPSG:2056", allow_override=True)
+        print(f"Coordinate system: {gdf.crs}")
+    return gdf
 
 
-def main():
-    warnings.filterwarnings("ignore")
+def process_ili_gpkg_file(gpkg_file, cache_dir=None, export_subsets=True, subset_dirs=ILI_SUBSET_DIRS):
+    """Creates the subset needed for the statistics of a single ILI converted GPKG file (compatible with ERKAS
+    Strassen >V2_0) and exports it as GPKG file
+
+    Args:
+        gpkg_file (Path): Path to the converted ILI_GPKG file of one canton
+        cache_dir (string): Path to the cache folder the subset is stored in (None: no caching)
+        export_subsets (bool): Export the subset as GPKG file (if False the geometry is not read)
+        subset_dirs (list): List of folders the subset is exported to
+
+    Returns:
+        DataFrame: Subset of the canton (without geometry) or None if the file can not be analysed
+    """
+    import pandas as pd
+
+    print(f"Processing: {gpkg_file.stem}")
+
+    # read in the fields needed for statistical analysis of the .gpkg file
+    gdf_subset = read_ili_gpkg(gpkg_file, read_geometry=export_subsets)
+    if gdf_subset is None:
+        print(
+            "Will not be analysed as used file has a geodatamodel with version <2_0 (Hint: check if field "
+            "IDLaenge exists in dataset")
+        print("___________________________________________________")
+        return None
+
+    # create subset with columns needed for statistical analysis
+    with stage_timer('normalize', gpkg_file.stem) as record:
+        canton_name_short = gpkg_file.stem.split('_')[-2]
+        gdf_subset = normalize_subset(gdf_subset, canton_name_short, "ILI_XTF")
+        record['rows'] = len(gdf_subset)
+    print(f"Columns of subset: {len(gdf_subset.columns)}")
+
+    if export_subsets:
+        export_subset(gdf_subset, gpkg_file.stem, subset_dirs)
+    if cache_dir is not None:
+        write_cached_subset(gdf_subset, cache_dir, gpkg_file.stem)
 
-    # execute the script
+    print("___________________________________________________")
+    return pd.DataFrame(gdf_subset.drop(columns="geometry", errors="ignore"))
 
-    # calculate the statistics from ILI files (only compatible with model version >2_0)
-    gpkg_dir = r'Data/ILI_GPKG_CONVERT/'
-    calculate_statistics_from_ili_gpkg(gpkg_dir, excel_export_path=r'Data/RESULTS/ILI_GPKG_STATISTICS.xlsx')
 
-    xlsx_dir = r'Data/XLSX_CORRECTED/'
-    calculate_statistics_from_xlsx_file(xlsx_dir, excel_export_path=r'Data/RESULTS/XLSX_GPKG_STATISTICS.xlsx')
+def process_ili_gpkg_file_chunked(gpkg_file, chunk_size=65536, export_subsets=True, subset_dirs=ILI_SUBSET_DIRS):
+    """Aggregates a single ILI converted GPKG file (compatible with ERKAS Strassen >V2_0) in batches of features and
+    exports the subset as GPKG file (chunked mode of process_ili_gpkg_file).
+
+    Args:
+        gpkg_file (Path): Path to the converted ILI_GPKG file of one canton
+        chunk_size (int): Number of features per batch
+        export_subsets (bool): Export the subset as GPKG file (if False the geometry is not read)
+        subset_dirs (list): List of folders the subset is exported to
+
+    Returns:
+        DataFrame: Partial statistics of the canton (see partial_ampelcode_statistics) or None if the file can not
+            be analysed
+    """
+    import pyarrow as pa
+    import pyogrio
+    from pyogrio.raw import open_arrow
+
+    print(f"Processing: {gpkg_file.stem}")
+    info = pyogrio.read_info(gpkg_file)
+    print(f"Number of points: {info['features']}")
+    columns = resolve_ili_gpkg_columns(list(info['fields']))
+    if columns is None:
+        print(
+            "Will not be analysed as used file has a geodatamodel with version <2_0 (Hint: check if field "
+            "IDLaenge exists in dataset")
+        print("___________________________________________________")
+        return None
+    canton_name_short = gpkg_file.stem.split('_')[-2]
+
+    def chunks():
+        with open_arrow(gpkg_file, columns=columns, read_geometry=export_subsets, batch_size=chunk_size,
+                        use_pyarrow=True) as (meta, reader):
+            for batch in reader:
+                df = pa.Table.from_batches([batch]).select(columns).to_pandas()
+                df.columns = SUBSET_COLUMNS[3:8]
+                geometries = batch.column(meta['geometry_name'] or 'wkb_geometry') if export_subsets else None
+                yield normalize_subset(df, canton_name_short, "ILI_XTF"), geometries
+
+    partial = aggregate_subset_chunks(chunks(), gpkg_file.stem, subset_dirs, export_subsets=export_subsets)
+    print("___________________________________________________")
+    return partial
+
+
+def calculate_statistics_from_ili_gpkg(gpkg_dir, excel_export_path=None, workers=1, cache_dir=None,
+                                       export_subsets=True, chunk_size=None, subset_dirs=ILI_SUBSET_DIRS,
+                                       cantons=None, skip_files=None):
+    """Calculates statistics for ILI converted GPKG file (compatible with ERKAS Strassen >V2_0)
 
-    # combine two Excel files into one
-    result_files = ['Data/RESULTS/ILI_GPKG_STATISTICS.xlsx', 'Data/RESULTS/XLSX_GPKG_STATISTICS.xlsx']
-    combine_results_xlsx(result_files, excel_export_path='Data/RESULTS/ERKAS_Strassen_Analyse_2021.xlsx')
+    Args:
+        gpkg_dir (string): Path to the folder location of the converted ILI_GPKG files (need to be in GPKG format)
+        excel_export_path (string): Path where the file containing the statistics is saved to, the format is given
+            by the suffix (see export_results, None: the statistics are only returned)
+        workers (int): Number of worker processes used to process the cantons in parallel (1: sequential,
+            None: number of CPUs)
+        cache_dir (string): Path to the cache folder, unchanged files are not processed again (None: no caching)
+        export_subsets (bool): Export the subsets as GPKG files (False: only the statistics are calculated)
+        chunk_size (int): Number of features per batch in chunked mode, the files are aggregated batch by batch and
+            the cache is not used (None: the files are read completely)
+        subset_dirs (list): List of folders the subsets are exported to
+        cantons (list): Abbreviations of the cantons to process (see select_canton_files, None: all files)
+        skip_files (list): Names of the files that are not processed (e.g. invalid files of the preflight, see
+            invalid_preflight_files)
 
-    # write a combined .gpkg of all processed files
-    print("Write combined .gpkg file for entire Switzerland")
-    gpkg_result_dir = r'O:\GIS\GEP\RLS\_Mitarbeitende\DF2020\ERKAS-processing\Data\RESULTS\GPKG_EXPORT_SUBSET'
-    gpkg_out_path = r'Data/RESULTS/ERKAS_Strassen_2021_CH.gpkg'
-    combine_gpkgs(gpkg_result_dir, gpkg_out_path)
+    Returns:
+        DataFrame: Statistics with one row per canton, columns sorted according to RESULT_COLUMNS
+    """
+    from functools import partial
+
+    gpkg_files = select_canton_files(sorted(list_file_paths(gpkg_dir, '*.gpkg')), cantons)
+    if skip_files:
+        gpkg_files = [gpkg_file for gpkg_file in gpkg_files if gpkg_file.name not in skip_files]
+
+    if chunk_size is None:
+        results, errors = run_cached_per_canton(partial(process_ili_gpkg_file, subset_dirs=subset_dirs), gpkg_files,
+                                                cache_dir, subset_dirs, workers=workers,
+                                                export_subsets=export_subsets)
+    else:
+        results, errors = run_per_canton(partial(process_ili_gpkg_file_chunked, chunk_size=chunk_size,
+                                                 export_subsets=export_subsets, subset_dirs=subset_dirs), gpkg_files,
+                                         workers=workers)
+    print_error_summary(errors)
+
+    with stage_timer('aggregate') as record:
+        if chunk_size is None:
+            points = concat_subsets(results)
+            df_results = calculate_ampelcode_statistics(points)
+            record['rows'] = len(points)
+        else:
+            df_results = finalize_ampelcode_statistics(merge_partial_statistics(results))
+    print(df_results.to_string(index=False))
+    if excel_export_path is not None:
+        export_results(df_results, excel_export_path)
+    return df_results
 
-if __name__ == main():
-    main()
+
+def typed_columns(df):
+    """Converts the object columns read from an Excel file to numeric columns where all values are numbers and to
+    text columns otherwise.
+
+    Args:
+        df (DataFrame): Dataframe with object columns
+    """
+    import pandas as pd
+
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        numeric = pd.to_numeric(values, errors='coerce')
+        if values.map(lambda value: isinstance(value, bool)).any() or numeric.notna().sum() != values.notna().sum():
+            columns[column] = values.map(lambda value: value if value is None else str(value)).astype('string')
+        elif (numeric.dropna() % 1 == 0).all():
+            columns[column] = numeric.astype('Int64')
+        else:
+            columns[column] = numeric.astype('float64')
+    return pd.DataFrame(columns, index=df.index)
+
+
+def read_xlsx_columns(xlsx_file, columns=None):
+    """Reads columns of an ERKAS Excel file (compatible with ERKAS Strassen >V2_0).
+
+    The first sheet is streamed in read-only mode. The header is in the fourth row, the data starts in the seventh
+    row and the first column is not used (layout of the ERKAS Excel template).
+
+    Args:
+        xlsx_file (Path): Path to the Excel file
+        columns (list): List of column names to read (default: XLSX_COLUMNS)
+
+    Returns:
+        DataFrame: Columns that exist in the file, converted with typed_columns
+    """
+    from pathlib import Path
+
+    columns = XLSX_COLUMNS if columns is None else columns
+    with stage_timer('read', Path(xlsx_file).stem) as record:
+        df = parse_xlsx_columns(xlsx_file, columns)
+        record['rows'] = len(df)
+        record['bytes_read'] = file_size(xlsx_file)
+    return df
+
+
+def parse_xlsx_columns(xlsx_file, columns):
+    """Parses columns of an ERKAS Excel file (see read_xlsx_columns).
+
+    Args:
+        xlsx_file (Path): Path to the Excel file
+        columns (list): List of column names to read
+    """
+    import pandas as pd
+
+    with open_xlsx_rows(xlsx_file, columns) as (columns, rows):
+        df = pd.DataFrame(list(rows), columns=columns, dtype=object)
+    return typed_columns(df)
+
+
+@contextmanager
+def open_xlsx_rows(xlsx_file, columns):
+    """Opens the first sheet of an ERKAS Excel file in read-only mode and streams the values of columns row by row
+    (layout of the ERKAS Excel template, see read_xlsx_columns).
+
+    Integral numbers are converted to integers like in pd.read_excel, trailing empty rows are not part of the data.
+    Columns are found with their spelling variants (see resolve_xlsx_header).
+
+    Args:
+        xlsx_file (Path): Path to the Excel file
+        columns (list): List of column names to read
+
+    Yields:
+        tuple: List of the header names of the columns that exist in the file and iterator over the rows (lists of
+            values)
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        # the dimensions stored in the file are not reliable in read-only mode
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        for i in range(3):
+            next(rows, None)
+        header = list(next(rows, ()))[1:]
+        for i in range(2):
+            next(rows, None)
+        header_names = resolve_xlsx_header(header, columns)
+        indexes = {name: header.index(name) + 1 for name in header_names.values()}
+
+        def data_rows():
+            empty_rows = 0
+            for row in rows:
+                if not any(value is not None for value in row[1:]):
+                    empty_rows += 1
+                    continue
+                # empty rows followed by data are part of the data
+                for i in range(empty_rows):
+                    yield [None] * len(indexes)
+                empty_rows = 0
+                values = [row[index] if index < len(row) else None for index in indexes.values()]
+                yield [int(value) if isinstance(value, float) and value.is_integer() else value for value in values]
+
+        yield list(indexes), data_rows()
+    finally:
+        workbook.close()
+
+
+def xlsx_column_key(name):
+    """Returns the key a column name of an Excel file is compared with (lower case, umlauts replaced, without
+    separators, e.g. idlaenge for IDLänge).
+
+    Args:
+        name (string): Column name
+    """
+    import re
+
+    key = str(name).lower()
+    for umlaut, replacement in [('ä', 'ae'), ('ö', 'oe'), ('ü', 'ue'), ('é', 'e'), ('è', 'e')]:
+        key = key.replace(umlaut, replacement)
+    return re.sub(r'[^a-z0-9]', '', key)
+
+
+def resolve_xlsx_header(header, columns):
+    """Finds columns in the header of an Excel file, columns with exactly the same name are preferred to spelling
+    variants (see xlsx_column_key and XLSX_HEADER_ALIASES).
+
+    Args:
+        header (list): Column names of the Excel file
+        columns (list): List of column names to find
+
+    Returns:
+        dict: Name in the header per column that exists in the file
+    """
+    keys = {}
+    for name in header:
+        if name is not None:
+            keys.setdefault(xlsx_column_key(name), name)
+    header_names = {}
+    for column in columns:
+        if column in header:
+            header_names[column] = column
+            continue
+        for alias in [column] + XLSX_HEADER_ALIASES.get(column, []):
+            if xlsx_column_key(alias) in keys:
+                header_names[column] = keys[xlsx_column_key(alias)]
+                break
+    return header_names
+
+
+def canton_abbreviation(inhaber, xlsx_file):
+    """Returns the canton abbreviation of an Inhaber value of an Excel file.
+
+    Prefixes like CH- are removed and cantonal numbers (e.g. CH22) are replaced by the abbreviation. Values that are
+    not a canton are replaced by the canton in the file name (if there is one).
+
+    Args:
+        inhaber (string): Value of the field Inhaber
+        xlsx_file (Path): Path to the Excel file
+
+    Returns:
+        string: Abbreviation of the canton (the value itself if no canton is found)
+    """
+    import re
+    import pandas as pd
+    from pathlib import Path
+
+    text = '' if pd.isna(inhaber) else re.sub(r'^CH[-_ ]?', '', str(inhaber).strip().upper())
+    if text.isdigit() and 1 <= int(text) <= len(CANTONS):
+        return CANTONS[int(text) - 1]
+    if text in CANTONS:
+        return text
+    for part in re.split(r'[^A-Za-z]+', Path(xlsx_file).stem):
+        if part.upper() in CANTONS:
+            return part.upper()
+    return inhaber
+
+
+def xlsx_length_unit(length):
+    """Returns the unit of the IDLaenge values of an Excel file (median of the positive values below
+    XLSX_LENGTH_KM_LIMIT: kilometers).
+
+    Args:
+        length (Series): IDLaenge values
+
+    Returns:
+        string: km or m
+    """
+    import pandas as pd
+
+    length = pd.to_numeric(length, errors='coerce')
+    positive = length[length > 0]
+    return 'km' if len(positive) and positive.median() < XLSX_LENGTH_KM_LIMIT else 'm'
+
+
+def read_xlsx_length_unit(xlsx_file):
+    """Returns the unit of the IDLaenge values of a whole Excel file, only the column IDLaenge is streamed (pre-pass
+    of the chunked mode, see xlsx_length_unit).
+
+    Args:
+        xlsx_file (Path): Path to the Excel file
+
+    Returns:
+        string: km or m
+    """
+    import numpy as np
+    import pandas as pd
+
+    with stage_timer('length unit', xlsx_file.stem) as record:
+        with open_xlsx_rows(xlsx_file, ['IDLaenge']) as (columns, rows):
+            if not columns:
+                return 'm'
+            length = pd.to_numeric(pd.Series(np.array([row[0] for row in rows], dtype=object)), errors='coerce')
+        record['rows'] = len(length)
+        record['bytes_read'] = file_size(xlsx_file)
+    return xlsx_length_unit(length)
+
+
+def normalize_xlsx_input(df, xlsx_file, length_unit=None):
+    """Corrects the columns read from an ERKAS Excel file (replaces the manual corrections in Excel).
+
+    The rules are applied to whole columns (or to the distinct values of a column):
+    - spelling variants of the header are renamed to the names of XLSX_COLUMNS
+    - Inhaber values are replaced by the canton abbreviation (see canton_abbreviation)
+    - KBfrei values are mapped with BOOLEAN_VALUES (e.g. ja, nein, N, TRUE) to booleans
+    - IDLaenge values in kilometers (median below XLSX_LENGTH_KM_LIMIT, see xlsx_length_unit) are converted to
+      meters
+    - Ampelcodes that are not numbers (e.g. nul) are removed
+    - easting and northing are swapped for points with swapped LV95 coordinates
+
+    Args:
+        df (DataFrame): Columns read from the Excel file (see read_xlsx_file)
+        xlsx_file (Path): Path to the Excel file
+        length_unit (string): Unit of the IDLaenge values of the whole file, km or m (None: decided from df)
+
+    Returns:
+        tuple: DataFrame with the columns of XLSX_COLUMNS that exist in the file and list of correction records
+            (file, rule, column, rows and detail)
+    """
+    import pandas as pd
+    from pathlib import Path
+
+    corrections = []
+
+    def log(rule, column, rows, detail=''):
+        if rows:
+            corrections.append({'file': Path(xlsx_file).stem, 'rule': rule, 'column': column, 'rows': int(rows),
+                                'detail': detail})
+
+    header_names = resolve_xlsx_header(list(df.columns), XLSX_COLUMNS)
+    for column, name in header_names.items():
+        if name != column:
+            log('header alias', column, len(df), f"{name} renamed")
+    df = df[list(header_names.values())].rename(columns={name: column for column, name in header_names.items()})
+
+    if 'Inhaber' in df.columns:
+        values = {value: canton_abbreviation(value, xlsx_file) for value in df['Inhaber'].dropna().unique()}
+        changed = {value: canton for value, canton in values.items() if canton != value}
+        for value, canton in changed.items():
+            log('canton abbreviation', 'Inhaber', (df['Inhaber'] == value).sum(), f"{value} -> {canton}")
+        if changed:
+            df['Inhaber'] = df['Inhaber'].astype(object).replace(changed)
+
+    if 'KBfrei' in df.columns:
+        keys = df['KBfrei'].astype(object).where(df['KBfrei'].notna(), '').astype(str).str.strip().str.lower()
+        kbfrei = keys.map(BOOLEAN_VALUES)
+        mapped = keys[kbfrei.notna() & ~keys.isin(['true', 'false'])]
+        for key, rows in mapped.value_counts().items():
+            log('boolean vocabulary', 'KBfrei', rows, f"{key} -> {BOOLEAN_VALUES[key]}")
+        unknown = keys[kbfrei.isna() & (keys != '')]
+        for key, rows in unknown.value_counts().items():
+            log('boolean vocabulary', 'KBfrei', rows, f"{key} unknown -> False")
+        df['KBfrei'] = kbfrei.fillna(False).astype(bool)
+
+    if 'IDLaenge' in df.columns:
+        length = pd.to_numeric(df['IDLaenge'], errors='coerce')
+        if (length_unit or xlsx_length_unit(length)) == 'km':
+            log('length unit', 'IDLaenge', length.notna().sum(), 'km -> m')
+            df['IDLaenge'] = length * 1000
+
+    for column in [column for column in AMPELCODE_COLUMNS if column in df.columns]:
+        classes = pd.to_numeric(df[column], errors='coerce')
+        invalid = df[column][classes.isna() & df[column].notna()]
+        for value, rows in invalid.astype(str).value_counts().items():
+            log('not a number', column, rows, f"{value} removed")
+        if len(invalid):
+            df[column] = classes
+
+    if 'Ort_E-Coord' in df.columns and 'Ort_N-Coord' in df.columns:
+        east = pd.to_numeric(df['Ort_E-Coord'], errors='coerce').astype('float64')
+        north = pd.to_numeric(df['Ort_N-Coord'], errors='coerce').astype('float64')
+        swapped = east.between(*LV95_NORTH_BOUNDS) & north.between(*LV95_EAST_BOUNDS)
+        log('LV95 axis swap', 'Ort_E-Coord', swapped.sum(), 'easting and northing swapped')
+        if swapped.any():
+            east, north = east.where(~swapped, north), north.where(~swapped, east)
+            df['Ort_E-Coord'] = east
+            df['Ort_N-Coord'] = north
+        outside = ~(east.between(*LV95_EAST_BOUNDS) & north.between(*LV95_NORTH_BOUNDS))
+        log('outside LV95', 'Ort_E-Coord', outside.sum(), 'not corrected')
+    return df, corrections
+
+
+def write_correction_log(corrections, name, correction_dir=XLSX_CORRECTION_DIR):
+    """Writes the correction log of an Excel file (one row per rule, column and detail) to the correction folder.
+
+    Args:
+        corrections (list): List of correction records (see normalize_xlsx_input)
+        name (string): Name of the log file (without suffix)
+        correction_dir (string): Folder of the correction logs
+    """
+    import pandas as pd
+
+    columns = ['file', 'rule', 'column', 'rows', 'detail']
+    df = pd.DataFrame(corrections, columns=columns)
+    # the records of the batches in chunked mode are summed
+    df = df.groupby(columns[:3] + ['detail'], sort=False, as_index=False)['rows'].sum()[columns]
+    os.makedirs(os.path.join(os.getcwd(), correction_dir), exist_ok=True)
+    df.to_csv(os.path.join(os.getcwd(), correction_dir, name + '.csv'), index=False)
+    for correction in df.itertuples():
+        print(f"Corrected: {correction.rule} ({correction.column}, {correction.rows} rows, {correction.detail})")
+
+
+def print_correction_summary(xlsx_files, correction_dir=XLSX_CORRECTION_DIR):
+    """Prints the number of corrected values per canton from the correction logs of the Excel files.
+
+    Args:
+        xlsx_files (list): List of paths to the Excel files
+        correction_dir (string): Folder of the correction logs
+    """
+    import pandas as pd
+    from pathlib import Path
+
+    log_paths = [os.path.join(os.getcwd(), correction_dir, Path(xlsx_file).stem + '.csv')
+                 for xlsx_file in xlsx_files]
+    logs = [pd.read_csv(log_path) for log_path in log_paths if os.path.exists(log_path)]
+    logs = [log for log in logs if len(log)]
+    if not logs:
+        return
+    summary = pd.concat(logs, ignore_index=True).groupby(['file', 'rule'], sort=False)['rows'].sum()
+    print(f"Automatic corrections of the Excel files (see {correction_dir}):")
+    print(summary.to_string())
+
+
+def read_xlsx_file(xlsx_file, sidecar_dir=None):
+    """Reads the columns needed for the statistics of an ERKAS Excel file with a columnar sidecar cache.
+
+    The parsed columns are stored as parquet file in the sidecar folder, together with the modification time and
+    the content hash of the Excel file. The Excel file is only parsed again if its content changed.
+
+    Args:
+        xlsx_file (Path): Path to the Excel file
+        sidecar_dir (string): Path to the sidecar folder (None: always parse the Excel file)
+
+    Returns:
+        DataFrame: Columns of XLSX_COLUMNS that exist in the file (with the names of the header of the file)
+    """
+    import json
+    import pandas as pd
+    from pathlib import Path
+
+    if sidecar_dir is None:
+        return read_xlsx_columns(xlsx_file)
+
+    def read_sidecar():
+        with stage_timer('sidecar read', Path(xlsx_file).stem) as record:
+            df = pd.read_parquet(sidecar_path)
+            record['rows'] = len(df)
+            record['bytes_read'] = file_size(sidecar_path)
+        return df
+
+    sidecar_path = os.path.join(sidecar_dir, Path(xlsx_file).stem + '.parquet')
+    meta_path = os.path.join(sidecar_dir, Path(xlsx_file).stem + '.json')
+    stat = os.stat(xlsx_file)
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(sidecar_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    if meta.get('columns') == XLSX_COLUMNS and meta.get('aliases') == XLSX_HEADER_ALIASES:
+        if (meta.get('mtime_ns'), meta.get('size')) == (stat.st_mtime_ns, stat.st_size):
+            return read_sidecar()
+        file_hash = file_content_hash(xlsx_file)
+        if meta.get('hash') == file_hash:
+            meta['mtime_ns'] = stat.st_mtime_ns
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+            return read_sidecar()
+    else:
+        file_hash = file_content_hash(xlsx_file)
+
+    df = read_xlsx_columns(xlsx_file)
+    if not os.path.exists(sidecar_dir):
+        os.makedirs(sidecar_dir)
+    df.to_parquet(sidecar_path + '.tmp')
+    os.replace(sidecar_path + '.tmp', sidecar_path)
+    with open(meta_path, 'w') as f:
+        json.dump({'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'hash': file_hash,
+                   'columns': XLSX_COLUMNS, 'aliases': XLSX_HEADER_ALIASES}, f)
+    return df
+
+
+def process_xlsx_file(xlsx_file, cache_dir=None, export_subsets=True, sidecar_dir=None, subset_dirs=XLSX_SUBSET_DIRS,
+                      correction_dir=XLSX_CORRECTION_DIR):
+    """Creates the subset needed for the statistics of a single ERKAS Excel file (compatible with ERKAS Strassen
+    >V2_0) and exports it as GPKG file
+
+    Args:
+        xlsx_file (Path): Path to the Excel file of one canton (needs to have a compatible header)
+        cache_dir (string): Path to the cache folder the subset is stored in (None: no caching)
+        export_subsets (bool): Export the subset as GPKG file (if False no geometry is created)
+        sidecar_dir (string): Path to the folder of the parsed Excel columns (None: always parse the Excel file)
+        subset_dirs (list): List of folders the subset is exported to
+        correction_dir (string): Folder of the correction log (see write_correction_log)
+
+    Returns:
+        DataFrame: Subset of the canton (without geometry) or None if the file can not be analysed
+    """
+    import geopandas as gpd
+
+    print(f"Processing: {xlsx_file}")
+    df = read_xlsx_file(xlsx_file, sidecar_dir=sidecar_dir)
+    print(f"Number of points: {len(df)}")
+    header_names = resolve_xlsx_header(list(df.columns), XLSX_COLUMNS)
+    length_unit = xlsx_length_unit(df[header_names['IDLaenge']]) if 'IDLaenge' in header_names else None
+    if length_unit is not None:
+        print(f"Unit of IDLaenge: {length_unit}")
+    with stage_timer('input corrections', xlsx_file.stem) as record:
+        df, corrections = normalize_xlsx_input(df, xlsx_file, length_unit)
+        record['rows'] = len(df)
+    write_correction_log(corrections, xlsx_file.stem, correction_dir)
+    required_columns = XLSX_COLUMNS if export_subsets else XLSX_COLUMNS[:-2]
+    missing_columns = [column for column in required_columns if column not in df.columns]
+    if missing_columns:
+        print(
+            "File will not be analysed as used file has a geodatamodel with version < V2_0 (Hint: check if field "
+            f"IDLaenge exists in dataset, missing fields: {missing_columns}")
+        print("___________________________________________________")
+        return None
+
+    # create subset with columns needed for statistical analysis
+    with stage_timer('normalize', xlsx_file.stem) as record:
+        canton_name_short = df['Inhaber'].values[0]
+        df_subset = normalize_subset(df, canton_name_short, "XLSX")
+        if export_subsets:
+            # create gdf from excel data
+            geometry = gpd.points_from_xy(df['Ort_E-Coord'].astype('float64'), df['Ort_N-Coord'].astype('float64'))
+            gdf_subset = gpd.GeoDataFrame(df_subset, geometry=geometry, crs='epsg:2056')
+        record['rows'] = len(df_subset)
+    print(f"Columns of subset: {len(df_subset.columns) + 1}")
+
+    if export_subsets:
+        export_subset(gdf_subset, xlsx_file.stem, subset_dirs)
+        if cache_dir is not None:
+            write_cached_subset(gdf_subset, cache_dir, xlsx_file.stem)
+    elif cache_dir is not None:
+        write_cached_subset(df_subset, cache_dir, xlsx_file.stem)
+
+    print("___________________________________________________")
+    return df_subset
+
+
+def process_xlsx_file_chunked(xlsx_file, chunk_size=65536, export_subsets=True, subset_dirs=XLSX_SUBSET_DIRS,
+                              correction_dir=XLSX_CORRECTION_DIR):
+    """Aggregates a single ERKAS Excel file (compatible with ERKAS Strassen >V2_0) in batches of rows and exports
+    the subset as GPKG file (chunked mode of process_xlsx_file).
+
+    Args:
+        xlsx_file (Path): Path to the Excel file of one canton (needs to have a compatible header)
+        chunk_size (int): Number of rows per batch
+        export_subsets (bool): Export the subset as GPKG file (if False no geometry is created)
+        subset_dirs (list): List of folders the subset is exported to
+        correction_dir (string): Folder of the correction log (see write_correction_log)
+
+    Returns:
+        DataFrame: Partial statistics of the canton (see partial_ampelcode_statistics) or None if the file can not
+            be analysed
+    """
+    from itertools import islice
+    import geopandas as gpd
+    import pandas as pd
+    import shapely
+
+    print(f"Processing: {xlsx_file}")
+    with open_xlsx_rows(xlsx_file, XLSX_COLUMNS) as (columns, rows):
+        required_columns = XLSX_COLUMNS if export_subsets else XLSX_COLUMNS[:-2]
+        header_names = resolve_xlsx_header(columns, XLSX_COLUMNS)
+        missing_columns = [column for column in required_columns if column not in header_names]
+        if missing_columns:
+            print(
+                "File will not be analysed as used file has a geodatamodel with version < V2_0 (Hint: check if "
+                f"field IDLaenge exists in dataset, missing fields: {missing_columns}")
+            print("___________________________________________________")
+            return None
+        # the unit of IDLaenge is decided from the whole file like in process_xlsx_file
+        length_unit = read_xlsx_length_unit(xlsx_file)
+        print(f"Unit of IDLaenge: {length_unit}")
+        canton_name_short = None
+        corrections = []
+
+        def chunks():
+            nonlocal canton_name_short
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    return
+                df = typed_columns(pd.DataFrame(chunk, columns=columns, dtype=object))
+                df, chunk_corrections = normalize_xlsx_input(df, xlsx_file, length_unit)
+                corrections.extend(chunk_corrections)
+                if canton_name_short is None:
+                    canton_name_short = df['Inhaber'].values[0]
+                geometries = None
+                if export_subsets:
+                    geometries = shapely.to_wkb(gpd.points_from_xy(df['Ort_E-Coord'].astype('float64'),
+                                                                   df['Ort_N-Coord'].astype('float64')))
+                yield normalize_subset(df, canton_name_short, "XLSX"), geometries
+
+        partial = aggregate_subset_chunks(chunks(), xlsx_file.stem, subset_dirs, export_subsets=export_subsets)
+    write_correction_log(corrections, xlsx_file.stem, correction_dir)
+    print("___________________________________________________")
+    return partial
+
+
+def calculate_statistics_from_xlsx_file(xlsx_dir, excel_export_path=None, workers=1, cache_dir=None,
+                                        export_subsets=True, sidecar_dir=None, chunk_size=None,
+                                        subset_dirs=XLSX_SUBSET_DIRS, correction_dir=XLSX_CORRECTION_DIR,
+                                        cantons=None, skip_files=None):
+    """Calculates statistics for ERKAS Excel files (compatible with ERKAS Strassen >V2_0)
+
+    Args:
+        xlsx_dir (string): Path to the folder location of the Excel files (need to have a compatible header)
+        excel_export_path (string): Path where the file containing the statistics is saved to, the format is given
+            by the suffix (see export_results, None: the statistics are only returned)
+        workers (int): Number of worker processes used to process the cantons in parallel (1: sequential,
+            None: number of CPUs)
+        cache_dir (string): Path to the cache folder, unchanged files are not processed again (None: no caching)
+        export_subsets (bool): Export the subsets as GPKG files (False: only the statistics are calculated)
+        sidecar_dir (string): Path to the folder where the parsed Excel columns are stored, unchanged Excel files are
+            not parsed again (None: always parse the Excel files)
+        chunk_size (int): Number of rows per batch in chunked mode, the files are aggregated batch by batch and the
+            cache and the sidecar are not used (None: the files are read completely)
+        subset_dirs (list): List of folders the subsets are exported to
+        correction_dir (string): Folder of the correction logs (see write_correction_log)
+        cantons (list): Abbreviations of the cantons to process (see select_canton_files, None: all files)
+        skip_files (list): Names of the files that are not processed (e.g. invalid files of the preflight, see
+            invalid_preflight_files)
+
+    Returns:
+        DataFrame: Statistics with one row per canton, columns sorted according to RESULT_COLUMNS
+    """
+    from functools import partial
+
+    xlsx_files = select_canton_files(sorted(list_file_paths(xlsx_dir, "*.xlsx")), cantons)
+    if skip_files:
+        xlsx_files = [xlsx_file for xlsx_file in xlsx_files if xlsx_file.name not in skip_files]
+
+    if chunk_size is None:
+        results, errors = run_cached_per_canton(partial(process_xlsx_file, sidecar_dir=sidecar_dir,
+                                                        subset_dirs=subset_dirs, correction_dir=correction_dir),
+                                                xlsx_files, cache_dir, subset_dirs, workers=workers,
+                                                export_subsets=export_subsets)
+    else:
+        results, errors = run_per_canton(partial(process_xlsx_file_chunked, chunk_size=chunk_size,
+                                                 export_subsets=export_subsets, subset_dirs=subset_dirs,
+                                                 correction_dir=correction_dir), xlsx_files, workers=workers)
+    print_error_summary(errors)
+    print_correction_summary(xlsx_files, correction_dir)
+
+    with stage_timer('aggregate') as record:
+        if chunk_size is None:
+            points = concat_subsets(results)
+            df_results = calculate_ampelcode_statistics(points)
+            record['rows'] = len(points)
+        else:
+            df_results = finalize_ampelcode_statistics(merge_partial_statistics(results))
+    print(df_results.to_string(index=False))
+    if excel_export_path is not None:
+        export_results(df_results, excel_export_path)
+    return df_results
+
+
+def preflight_ili_gpkg(gpkg_file):
+    """Checks the layer schema of an ILI converted GPKG file against the model ERKAS Strassen V2_0, the features
+    are not read.
+
+    Args:
+        gpkg_file (Path): Path to the converted ILI_GPKG file of one canton
+
+    Returns:
+        dict: Preflight record (see PREFLIGHT_COLUMNS), status invalid if a field needed for the statistics is
+            missing or ambiguous or the file name has no canton
+    """
+    import pyogrio
+
+    with stage_timer('preflight', gpkg_file.stem) as record:
+        info = pyogrio.read_info(gpkg_file)
+        record['bytes_read'] = file_size(gpkg_file)
+    field_names = list(info['fields'])
+    invalid = []
+    warning = []
+    for column_filter in ILI_COLUMN_FILTERS:
+        matches = filter_df_column_names(field_names, column_filter)
+        if not matches:
+            invalid.append(f"missing field {column_filter} (model version <2_0?)")
+        elif len(matches) > 1:
+            invalid.append(f"ambiguous field {column_filter} ({', '.join(matches)})")
+    # the canton is taken from the file name like in process_ili_gpkg_file
+    parts = gpkg_file.stem.split('_')
+    canton = parts[-2] if len(parts) > 1 else None
+    if canton is None:
+        invalid.append("no canton in file name (ERKAS_Strassen_<canton>_<year>)")
+    elif canton.upper() not in CANTONS:
+        warning.append(f"unknown canton {canton} in file name")
+    if info['geometry_type'] not in ['Point', 'Point Z']:
+        warning.append(f"geometry type {info['geometry_type']}")
+    if info['crs'] != 'EPSG:2056':
+        warning.append(f"coordinate system {info['crs']} (replaced by EPSG:2056)")
+    if not info['features']:
+        warning.append("no features")
+    return {'file': gpkg_file.name, 'format': 'ILI_XTF', 'canton': canton,
+            'status': 'invalid' if invalid else 'warning' if warning else 'ok', 'features': info['features'],
+            'problems': '; '.join(invalid + warning)}
+
+
+def preflight_xlsx_file(xlsx_file, export_subsets=True):
+    """Checks the header row of an ERKAS Excel file against the columns of XLSX_COLUMNS (German template and the
+    spelling variants of XLSX_HEADER_ALIASES), only the header and the first data row are read.
+
+    Args:
+        xlsx_file (Path): Path to the Excel file of one canton
+        export_subsets (bool): The coordinates are needed (export of the subsets)
+
+    Returns:
+        dict: Preflight record (see PREFLIGHT_COLUMNS), status invalid if a column needed for the statistics is
+            missing or the file has no data rows
+    """
+    with stage_timer('preflight', xlsx_file.stem) as record:
+        with open_xlsx_rows(xlsx_file, XLSX_COLUMNS) as (columns, rows):
+            first_row = next(rows, None)
+        record['bytes_read'] = file_size(xlsx_file)
+    header_names = resolve_xlsx_header(columns, XLSX_COLUMNS)
+    required_columns = XLSX_COLUMNS if export_subsets else XLSX_COLUMNS[:-2]
+    missing_columns = [column for column in required_columns if column not in header_names]
+    invalid = []
+    warning = []
+    if missing_columns:
+        invalid.append(f"missing columns {', '.join(missing_columns)} (model version <V2_0?)")
+    canton = None
+    if first_row is None:
+        invalid.append("no data rows")
+    elif 'Inhaber' in header_names:
+        # the canton is taken from the first row like in process_xlsx_file
+        canton = canton_abbreviation(first_row[columns.index(header_names['Inhaber'])], xlsx_file)
+        if canton not in CANTONS:
+            warning.append(f"unknown canton {canton} in field Inhaber")
+    return {'file': xlsx_file.name, 'format': 'XLSX', 'canton': canton,
+            'status': 'invalid' if invalid else 'warning' if warning else 'ok', 'features': None,
+            'problems': '; '.join(invalid + warning)}
+
+
+def preflight_file(file):
+    """Checks the schema of one input file (see preflight_ili_gpkg and preflight_xlsx_file).
+
+    Args:
+        file (Path): Path to the converted ILI_GPKG file or the Excel file
+
+    Returns:
+        dict: Preflight record (see PREFLIGHT_COLUMNS)
+    """
+    if file.suffix.lower() == '.gpkg':
+        return preflight_ili_gpkg(file)
+    return preflight_xlsx_file(file)
+
+
+def preflight_inputs(gpkg_dir, xlsx_dir, report_path=None, workers=1, cantons=None):
+    """Checks the schemas of all input files before the statistics are calculated (compatibility report).
+
+    Only the layer schemas of the GPKG files and the header rows of the Excel files are read, in parallel. Files
+    that can not be opened are invalid. The modification time and size of the files are stored in the report, the
+    statistics stages skip the invalid files that have not changed since (see invalid_preflight_files).
+
+    Args:
+        gpkg_dir (string): Path to the folder of the converted ILI_GPKG files
+        xlsx_dir (string): Path to the folder of the Excel files
+        report_path (string): Path of the compatibility report (CSV file, None: the report is only returned)
+        workers (int): Number of worker processes (1: sequential, None: number of CPUs)
+        cantons (list): Abbreviations of the cantons to check (see select_canton_files, None: all files)
+
+    Returns:
+        DataFrame: Compatibility report with one row per file (see PREFLIGHT_COLUMNS)
+    """
+    import pandas as pd
+
+    files = []
+    for folder, file_type in [(gpkg_dir, '*.gpkg'), (xlsx_dir, '*.xlsx')]:
+        if os.path.exists(folder):
+            files += select_canton_files(sorted(list_file_paths(folder, file_type)), cantons)
+    # state of the files when they are checked
+    file_stats = [os.stat(file) for file in files]
+    results, errors = run_per_canton(preflight_file, files, workers=workers)
+    messages = {file: message for file, message in errors}
+    for i, file in enumerate(files):
+        if results[i] is None:
+            results[i] = {'file': file.name, 'format': 'ILI_XTF' if file.suffix.lower() == '.gpkg' else 'XLSX',
+                          'canton': None, 'status': 'invalid', 'features': None,
+                          'problems': f"can not be opened ({messages[file]})"}
+        results[i].update({'path': os.path.abspath(file), 'mtime_ns': file_stats[i].st_mtime_ns,
+                           'size': file_stats[i].st_size})
+    df_report = pd.DataFrame(results, columns=PREFLIGHT_COLUMNS).astype({'features': 'Int64'})
+
+    counts = df_report['status'].value_counts()
+    print(f"Preflight of {len(df_report)} file(s): " +
+          ", ".join(f"{counts.get(status, 0)} {status}" for status in ['ok', 'warning', 'invalid']))
+    for row in df_report[df_report['status'] != 'ok'].itertuples():
+        print(f"  {row.status}: {row.file} ({row.problems})")
+    if report_path is not None:
+        if os.path.dirname(report_path):
+            os.makedirs(os.path.dirname(report_path), exist_ok=True)
+        df_report.to_csv(report_path, index=False)
+    return df_report
+
+
+def invalid_preflight_files(report_path):
+    """Returns the names of the files that are invalid according to a compatibility report (see preflight_inputs).
+
+    Invalid files that were changed since the preflight (modification time or size) or that are not in the same
+    place are not returned, they are processed and reported.
+
+    Args:
+        report_path (string): Path to the compatibility report
+
+    Returns:
+        list: File names (empty if there is no report)
+    """
+    import pandas as pd
+
+    if not os.path.exists(report_path):
+        return []
+    df_report = pd.read_csv(report_path)
+    df_invalid = df_report[df_report['status'] == 'invalid']
+    if not set(PREFLIGHT_COLUMNS).issubset(df_report.columns):
+        # report of an earlier version without the state of the files
+        if len(df_invalid):
+            print(f"Preflight report without the state of the files, invalid files are processed (run the preflight "
+                  f"again): {report_path}")
+        return []
+    invalid_files = []
+    for row in df_invalid.itertuples():
+        try:
+            file_stat = os.stat(row.path)
+            unchanged = file_stat.st_mtime_ns == row.mtime_ns and file_stat.st_size == row.size
+        except OSError:
+            unchanged = False
+        if unchanged:
+            invalid_files.append(row.file)
+        else:
+            print(f"Changed since the preflight, processed: {row.file} (run the preflight again)")
+    return invalid_files
+
+
+def combine_results(results):
+    """Combines the statistics of the input formats into one table sorted according to the predefined column order.
+
+    Args:
+        results (list): List of statistics (DataFrames returned by the statistics functions, None is skipped)
+
+    Returns:
+        DataFrame: Combined statistics with the columns of RESULT_COLUMNS
+    """
+    import pandas as pd
+
+    with stage_timer('combine results') as record:
+        results = [df_results for df_results in results if df_results is not None]
+        if not results:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        df_combined = pd.concat(results, ignore_index=True)
+        df_combined = df_combined.reindex(columns=RESULT_COLUMNS)
+        record['rows'] = len(df_combined)
+    return df_combined
+
+
+def export_results(df_results, export_path):
+    """Writes statistics to a file, the format is given by the suffix of the path.
+
+    Supported formats are Excel (.xlsx), Parquet (.parquet), CSV (.csv) and SQLite (.sqlite or .db, table with the
+    name of the file).
+
+    Args:
+        df_results (DataFrame): Statistics to write
+        export_path (string): Path of the file
+    """
+    import sqlite3
+    from pathlib import Path
+
+    suffix = Path(export_path).suffix.lower()
+    if suffix not in ['.xlsx', '.parquet', '.csv', '.sqlite', '.db']:
+        raise ValueError(f"Format of the results not supported: {export_path} (use .xlsx, .parquet, .csv or .sqlite)")
+    if os.path.dirname(export_path):
+        os.makedirs(os.path.dirname(export_path), exist_ok=True)
+    with stage_timer('results write') as record:
+        if suffix == '.xlsx':
+            df_results.to_excel(export_path, index=False)
+        elif suffix == '.parquet':
+            # Berechnungsintervall [m] holds numbers and text (variabel)
+            object_columns = [column for column in df_results.columns if df_results[column].dtype == object]
+            df_results.astype({column: 'string' for column in object_columns}).to_parquet(export_path, index=False)
+        elif suffix == '.csv':
+            df_results.to_csv(export_path, index=False)
+        else:
+            with sqlite3.connect(export_path) as connection:
+                df_results.to_sql(Path(export_path).stem, connection, if_exists='replace', index=False)
+            connection.close()
+        record['rows'] = len(df_results)
+        record['bytes_written'] = file_size(export_path)
+
+
+def read_results(result_path):
+    """Reads statistics written by export_results.
+
+    Args:
+        result_path (string): Path of the file (.xlsx, .parquet, .csv, .sqlite or .db)
+
+    Returns:
+        DataFrame: Statistics
+    """
+    import sqlite3
+    import pandas as pd
+    from pathlib import Path
+
+    suffix = Path(result_path).suffix.lower()
+    if suffix == '.xlsx':
+        return pd.read_excel(result_path)
+    if suffix == '.parquet':
+        df_results = pd.read_parquet(result_path)
+        # Berechnungsintervall [m] is stored as text (see export_results), the numbers are restored
+        if 'Berechnungsintervall [m]' in df_results.columns:
+            intervals = df_results['Berechnungsintervall [m]'].astype(object)
+            lengths = pd.to_numeric(intervals, errors='coerce')
+            df_results['Berechnungsintervall [m]'] = intervals.where(lengths.isna(), lengths.map(length_value))
+        return df_results
+    if suffix == '.csv':
+        return pd.read_csv(result_path)
+    if suffix in ['.sqlite', '.db']:
+        with sqlite3.connect(result_path) as connection:
+            df_results = pd.read_sql(f'SELECT * FROM "{Path(result_path).stem}"', connection)
+        connection.close()
+        return df_results
+    raise ValueError(f"Format of the results not supported: {result_path} (use .xlsx, .parquet, .csv or .sqlite)")
+
+
+def combine_results_xlsx(result_files, excel_export_path):
+    """Combine excel files in a directory into one and sort them according to predefined colum order
+
+    The statistics can be combined in memory with combine_results, this function combines statistics that were
+    written to files (any format of export_results).
+
+    Args:
+        result_files (List): List containing the paths to the Excel files to combine
+        excel_export_path (string): Path where the excel file containing the statistics is saved to
+    """
+    df_combined = combine_results([read_results(file) for file in result_files])
+    export_results(df_combined, excel_export_path)
+
+
+def read_subset_points(subset_files):
+    """Reads exported subsets (see export_subset) into one point table with the coordinates of the points.
+
+    Args:
+        subset_files (list): List of paths to the subset GPKG files
+
+    Returns:
+        DataFrame: Point table in the normalized subset schema (see SUBSET_DTYPES) with the coordinates E and N
+    """
+    import numpy as np
+    import pandas as pd
+    import pyogrio
+    import shapely
+    from pathlib import Path
+
+    subsets = []
+    for subset_file in subset_files:
+        with stage_timer('subset read', Path(subset_file).stem) as record:
+            meta, table = pyogrio.read_arrow(subset_file, columns=SUBSET_COLUMNS[:-1])
+            subset = table.select(SUBSET_COLUMNS[:-1]).to_pandas()
+            # subsets of earlier campaigns store KBfrei, IDLaenge and the Ampelcodes as text (see normalize_subset)
+            if subset['KBfrei'].dtype != bool:
+                subset['KBfrei'] = subset['KBfrei'].astype(str).str.lower() == 'true'
+            subset['IDLaenge'] = pd.to_numeric(subset['IDLaenge'], errors='coerce')
+            for code in AMPELCODE_COLUMNS:
+                classes = np.trunc(pd.to_numeric(subset[code], errors='coerce').astype('float64'))
+                subset[code] = classes.where(classes.between(0, 127))
+            subset = subset.astype(SUBSET_DTYPES)
+            geometry = table[meta['geometry_name'] or 'wkb_geometry'].to_numpy(zero_copy_only=False)
+            coordinates = shapely.get_coordinates(shapely.from_wkb(geometry))
+            if len(coordinates) != len(subset):
+                raise ValueError(f"Subset with geometries that are not single points: {subset_file}")
+            subsets.append(subset.assign(E=coordinates[:, 0], N=coordinates[:, 1]))
+            record['rows'] = len(subset)
+            record['bytes_read'] = file_size(subset_file)
+    points = concat_subsets(subsets)
+    if not subsets:
+        points = points.assign(E=np.zeros(0), N=np.zeros(0))
+    return points
+
+
+def assign_regions(coordinates, regions_path, region_field, layer=None):
+    """Assigns points to the polygons of a region layer (e.g. districts, municipalities or grid cells).
+
+    The points are indexed with a STRtree, the candidates of the bounding box of each polygon are tested against the
+    prepared polygon. Points on the common boundary of several polygons are assigned to the first polygon of the
+    layer.
+
+    Args:
+        coordinates (ndarray): LV95 coordinates of the points (one row per point, columns E and N)
+        regions_path (string): Path to the region layer (any format readable with GDAL/OGR)
+        region_field (string): Field of the region layer with the name of the region
+        layer (string): Name of the layer (None: first layer of the file)
+
+    Returns:
+        Categorical: Region of each point (missing for points outside of all regions)
+    """
+    import geopandas as gpd
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    regions = gpd.read_file(regions_path, layer=layer, columns=[region_field], engine='pyogrio')
+    if regions.crs is not None and regions.crs != 'EPSG:2056':
+        regions = regions.to_crs('EPSG:2056')
+    region_codes, region_names = pd.factorize(regions[region_field])
+    polygons = regions.geometry.to_numpy()
+    shapely.prepare(polygons)
+
+    tree = shapely.STRtree(shapely.points(coordinates))
+    polygon_index, point_index = tree.query(polygons)
+    inside = shapely.intersects_xy(polygons[polygon_index], coordinates[point_index, 0],
+                                   coordinates[point_index, 1])
+    polygon_index, point_index = polygon_index[inside], point_index[inside]
+
+    # keep the first polygon of each point
+    order = np.lexsort((polygon_index, point_index))
+    assigned, first = np.unique(point_index[order], return_index=True)
+    codes = np.full(len(coordinates), -1, dtype='int64')
+    codes[assigned] = region_codes[polygon_index[order][first]]
+    return pd.Categorical.from_codes(codes, region_names)
+
+
+def cached_region_assignment(coordinates, regions_path, region_field, layer=None, cache_dir=None):
+    """Assigns points to regions (see assign_regions), the assignment is cached per region layer and field.
+
+    The assignment is stored as parquet file in the cache folder, together with a hash of the point coordinates and
+    the content hash of the region layer. It is only calculated again if the points or the region layer changed.
+
+    Args:
+        coordinates (ndarray): LV95 coordinates of the points (one row per point, columns E and N)
+        regions_path (string): Path to the region layer
+        region_field (string): Field of the region layer with the name of the region
+        layer (string): Name of the layer (None: first layer of the file)
+        cache_dir (string): Path to the cache folder (None: no caching)
+
+    Returns:
+        Categorical: Region of each point (missing for points outside of all regions)
+    """
+    import hashlib
+    import json
+    import numpy as np
+    import pandas as pd
+    from pathlib import Path
+
+    if cache_dir is None:
+        with stage_timer('region assignment') as record:
+            regions = assign_regions(coordinates, regions_path, region_field, layer=layer)
+            record['rows'] = len(coordinates)
+        return regions
+
+    name = '_'.join(part for part in [Path(regions_path).stem, layer, region_field] if part)
+    assignment_path = os.path.join(cache_dir, name + '.parquet')
+    meta_path = os.path.join(cache_dir, name + '.json')
+    meta = {
+        'points': hashlib.sha256(np.ascontiguousarray(coordinates, dtype='float64').tobytes()).hexdigest(),
+        'regions': file_content_hash(regions_path),
+        'layer': layer,
+        'field': region_field,
+    }
+    if os.path.exists(meta_path) and os.path.exists(assignment_path):
+        with open(meta_path) as f:
+            if json.load(f) == meta:
+                with stage_timer('region assignment read') as record:
+                    regions = pd.read_parquet(assignment_path)['Region'].array
+                    record['rows'] = len(regions)
+                    record['bytes_read'] = file_size(assignment_path)
+                return regions
+
+    with stage_timer('region assignment') as record:
+        regions = assign_regions(coordinates, regions_path, region_field, layer=layer)
+        record['rows'] = len(coordinates)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    pd.DataFrame({'Region': regions}).to_parquet(assignment_path + '.tmp')
+    os.replace(assignment_path + '.tmp', assignment_path)
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f)
+    return regions
+
+
+def calculate_regional_statistics(subset_dir, regions_path, region_field, export_path=None, layer=None,
+                                  cache_dir=None):
+    """Calculates the statistics per region of a polygon layer instead of per canton.
+
+    The points of the exported subsets of all cantons are assigned to the polygons of the region layer (see
+    assign_regions) and aggregated with the same statistics as the cantons (length, KB-befreit, beurteilt,
+    zu beurteilen and the length per Ampelcode class). Points outside of all regions are not counted.
+
+    Args:
+        subset_dir (string): Path to the folder of the exported subsets (e.g. Data/RESULTS/GPKG_EXPORT_SUBSET)
+        regions_path (string): Path to the region layer (polygons, reprojected to LV95 if necessary)
+        region_field (string): Field of the region layer with the name of the region (first column of the results)
+        export_path (string): Path where the file containing the statistics is saved to, the format is given by the
+            suffix (see export_results, None: the statistics are only returned)
+        layer (string): Name of the layer of the region file (None: first layer of the file)
+        cache_dir (string): Path to the cache folder of the point-to-region assignment (None: no caching)
+
+    Returns:
+        DataFrame: Statistics with one row per region, columns sorted according to RESULT_COLUMNS (with the region
+            field instead of Kanton and Format)
+    """
+    subset_files = subset_store_files(subset_dir)
+    points = read_subset_points(subset_files)
+    coordinates = points[['E', 'N']].to_numpy()
+    points[region_field] = cached_region_assignment(coordinates, regions_path, region_field, layer=layer,
+                                                    cache_dir=cache_dir)
+
+    outside = int(points[region_field].isna().sum())
+    if outside:
+        print(f"Points outside of the regions (not counted): {outside} of {len(points)}")
+    with stage_timer('aggregate') as record:
+        df_results = calculate_ampelcode_statistics(points, keys=[region_field])
+        record['rows'] = len(points)
+    print(df_results.to_string(index=False))
+    if export_path is not None:
+        export_results(df_results, export_path)
+    return df_results
+
+
+def campaign_subset_files(campaign_path):
+    """Returns the subset GPKG files of a campaign.
+
+    Args:
+        campaign_path (string): Path to the folder of the exported subsets or to the combined GPKG file (see
+            combine_gpkgs) of the campaign
+
+    Returns:
+        list: List of paths to the GPKG files
+    """
+    if os.path.isdir(campaign_path):
+        return subset_store_files(campaign_path)
+    return [campaign_path]
+
+
+def match_campaign_points(points_old, points_new, tolerance=2.0):
+    """Matches the points of two campaigns by position.
+
+    The older points are indexed with a STRtree, the candidates within the tolerance of each newer point are
+    queried at once and candidates of another canton are dropped. The candidate pairs are walked by increasing
+    distance and a pair is matched if both points are still free (greedy matching, each point is matched at most
+    once).
+
+    Args:
+        points_old (DataFrame): Points of the older campaign with the columns Kanton, E and N
+        points_new (DataFrame): Points of the newer campaign with the columns Kanton, E and N
+        tolerance (float): Maximum distance of matched points in meters
+
+    Returns:
+        DataFrame: One row per matched pair with the row positions old and new and the distance in meters
+    """
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    coordinates_old = points_old[['E', 'N']].to_numpy()
+    coordinates_new = points_new[['E', 'N']].to_numpy()
+    tree = shapely.STRtree(shapely.points(coordinates_old))
+    new, old = tree.query(shapely.points(coordinates_new), predicate='dwithin', distance=tolerance)
+    same_canton = (points_old['Kanton'].astype(str).to_numpy()[old] ==
+                   points_new['Kanton'].astype(str).to_numpy()[new])
+    new, old = new[same_canton], old[same_canton]
+    distance = np.hypot(*(coordinates_new[new] - coordinates_old[old]).T)
+
+    order = np.lexsort((old, new, distance))
+    free_old = np.ones(len(coordinates_old), dtype=bool)
+    free_new = np.ones(len(coordinates_new), dtype=bool)
+    matched = np.zeros(len(order), dtype=bool)
+    for i, (pair_old, pair_new) in enumerate(zip(old[order].tolist(), new[order].tolist())):
+        if free_old[pair_old] and free_new[pair_new]:
+            free_old[pair_old] = free_new[pair_new] = False
+            matched[i] = True
+    matches = pd.DataFrame({'old': old[order][matched], 'new': new[order][matched],
+                            'distance': distance[order][matched]})
+    return matches.sort_values('new', ignore_index=True)
+
+
+def compare_campaigns(old_path, new_path, tolerance=2.0, export_path=None, transitions_export_path=None,
+                      points_export_path=None):
+    """Compares two ERKAS campaigns (e.g. 2021 and 2022) point by point.
+
+    The points of the campaigns are matched by position (see match_campaign_points). For the matched points the
+    transitions of the Ampelcode classes and of the KBfrei status are aggregated per canton with the length of the
+    newer campaign. Points without a match are reported as removed (entfernt) or added (neu).
+
+    Args:
+        old_path (string): Subset folder or combined GPKG file of the older campaign (see campaign_subset_files)
+        new_path (string): Subset folder or combined GPKG file of the newer campaign
+        tolerance (float): Maximum distance of matched points in meters
+        export_path (string): Path where the summary per canton is saved to, the format is given by the suffix (see
+            export_results, None: not written)
+        transitions_export_path (string): Path where the transitions per canton are saved to (None: not written)
+        points_export_path (string): Path of the GPKG file with the compared points (None: not written)
+
+    Returns:
+        tuple: Summary per canton (km matched, removed and added, newly and no longer KB-befreit, newly and no longer
+            beurteilt and with another class per Ampelcode), transitions per canton (points and km per field, old
+            and new value) and the compared points (one row per matched, removed or added point)
+    """
+    import numpy as np
+    import pandas as pd
+
+    points_old = read_subset_points(campaign_subset_files(old_path))
+    points_new = read_subset_points(campaign_subset_files(new_path))
+    with stage_timer('campaign matching') as record:
+        matches = match_campaign_points(points_old, points_new, tolerance=tolerance)
+        record['rows'] = len(points_old) + len(points_new)
+    print(f"Matched points: {len(matches)} of {len(points_old)} (older campaign) and {len(points_new)} "
+          f"(newer campaign)")
+
+    with stage_timer('campaign comparison') as record:
+        unmatched_old = np.ones(len(points_old), dtype=bool)
+        unmatched_old[matches['old'].to_numpy()] = False
+        unmatched_new = np.ones(len(points_new), dtype=bool)
+        unmatched_new[matches['new'].to_numpy()] = False
+        removed, added = np.flatnonzero(unmatched_old), np.flatnonzero(unmatched_new)
+        status = np.repeat(['zugeordnet', 'entfernt', 'neu'], [len(matches), len(removed), len(added)])
+        # rows of the compared points in the point tables of the campaigns (-1: no point in the campaign)
+        old_rows = np.r_[matches['old'].to_numpy(), removed, np.full(len(added), -1)]
+        new_rows = np.r_[matches['new'].to_numpy(), np.full(len(removed), -1), added]
+
+        # position and length of the newer campaign (of the older campaign for removed points)
+        columns = ['Kanton', 'E', 'N', 'IDLaenge']
+        df_points = pd.concat([points[columns].iloc[rows].astype({'Kanton': str}) for points, rows in
+                               [(points_new, matches['new']), (points_old, removed), (points_new, added)]],
+                              ignore_index=True)
+        df_points.insert(1, 'Abgleich', status)
+        df_points.insert(2, 'Distanz [m]', np.r_[matches['distance'].to_numpy(), np.full(len(removed) + len(added),
+                                                                                         np.nan)])
+        fields = ['KBfrei'] + AMPELCODE_COLUMNS
+        for field in fields:
+            dtype = 'boolean' if field == 'KBfrei' else 'Int8'
+            df_points[f"{field}_alt"] = points_old[field].astype(dtype).array.take(old_rows, allow_fill=True)
+            df_points[f"{field}_neu"] = points_new[field].astype(dtype).array.take(new_rows, allow_fill=True)
+
+        millimeters = (df_points['IDLaenge'].astype('float64') * 1000).round().fillna(0).astype('int64').to_numpy()
+        matched = status == 'zugeordnet'
+
+        # values of the matched points as integers (KBfrei 0 and 1), missing values are -1 (ohne)
+        values = {f"{field}_{campaign}": df_points[f"{field}_{campaign}"].astype('Int16').fillna(-1).to_numpy(
+            dtype='int16') for field in fields for campaign in ['alt', 'neu']}
+        transitions = [pd.DataFrame({
+            'Kanton': df_points['Kanton'].to_numpy()[matched],
+            'Feld': field,
+            'Alt': values[f"{field}_alt"][matched],
+            'Neu': values[f"{field}_neu"][matched],
+            'Laenge': millimeters[matched],
+        }) for field in fields]
+        grouped = pd.concat(transitions, ignore_index=True).groupby(['Kanton', 'Feld', 'Alt', 'Neu'])['Laenge']
+        df_transitions = pd.DataFrame({'Punkte': grouped.size(), 'Laenge [km]': grouped.sum() / 1e6}).reset_index()
+        for column in ['Alt', 'Neu']:
+            df_transitions[column] = ['ohne' if value == -1 else str(bool(value)) if field == 'KBfrei' else str(value)
+                                      for field, value in zip(df_transitions['Feld'], df_transitions[column])]
+
+        kbfrei_old = values['KBfrei_alt'] == 1
+        kbfrei_new = values['KBfrei_neu'] == 1
+        changes = {
+            'Zugeordnet [km]': matched,
+            'Entfernt [km]': status == 'entfernt',
+            'Neu [km]': status == 'neu',
+            'Neu KB-befreit [km]': matched & ~kbfrei_old & kbfrei_new,
+            'Nicht mehr KB-befreit [km]': matched & kbfrei_old & ~kbfrei_new,
+        }
+        for code in AMPELCODE_COLUMNS:
+            name = code.replace('AmpelCode', 'Ampelcode')
+            old, new = values[f"{code}_alt"], values[f"{code}_neu"]
+            beurteilt_old = np.isin(old, AMPELCODE_CLASSES_BEURTEILT)
+            beurteilt_new = np.isin(new, AMPELCODE_CLASSES_BEURTEILT)
+            changes[f"Neu beurteilt {name} [km]"] = matched & ~beurteilt_old & beurteilt_new
+            changes[f"Nicht mehr beurteilt {name} [km]"] = matched & beurteilt_old & ~beurteilt_new
+            changes[f"Andere Klasse {name} [km]"] = matched & (old != new)
+        lengths = pd.DataFrame({column: np.where(mask, millimeters, 0) for column, mask in changes.items()})
+        df_summary = (lengths.groupby(df_points['Kanton'].to_numpy()).sum() / 1e6).rename_axis('Kanton').reset_index()
+        record['rows'] = len(df_points)
+
+    print(df_summary.to_string(index=False))
+    if export_path is not None:
+        export_results(df_summary, export_path)
+    if transitions_export_path is not None:
+        export_results(df_transitions, transitions_export_path)
+    if points_export_path is not None:
+        import geopandas as gpd
+
+        if os.path.dirname(points_export_path):
+            os.makedirs(os.path.dirname(points_export_path), exist_ok=True)
+        with stage_timer('points write') as record:
+            gpd.GeoDataFrame(df_points, geometry=gpd.points_from_xy(df_points['E'], df_points['N']),
+                             crs='EPSG:2056').to_file(points_export_path, driver='GPKG', engine='pyogrio',
+                                                      use_arrow=True)
+            record['rows'] = len(df_points)
+            record['bytes_written'] = file_size(points_export_path)
+    return df_summary, df_transitions, df_points
+
+
+def read_gpkg_schema(gpkg_file):
+    """Reads the schema of the (first) layer of a GPKG file without reading its features.
+
+    Args:
+        gpkg_file (string): Path to the GPKG file
+
+    Returns:
+        dict: Field names, field types, geometry type and coordinate system of the layer
+    """
+    import pyogrio
+
+    info = pyogrio.read_info(gpkg_file)
+    return {'fields': list(info['fields']), 'dtypes': [str(dtype) for dtype in info['dtypes']],
+            'geometry_type': info['geometry_type'], 'crs': info['crs']}
+
+
+def validate_gpkg_schemas(gpkg_files):
+    """Checks that GPKG files have the same structure before they are merged.
+
+    Field names, geometry type and coordinate system need to match. Fields with different types in different files
+    (e.g. numbers in the subsets of the Excel files and text in the subsets of the ILI files) are merged as text.
+
+    Args:
+        gpkg_files (list): List of paths to the GPKG files
+
+    Returns:
+        tuple: Schema of the first file and list of fields that need to be merged as text
+    """
+    schemas = [read_gpkg_schema(gpkg_file) for gpkg_file in gpkg_files]
+    reference = schemas[0]
+    mismatched = [f"{gpkg_file} ({schema['fields']}, {schema['geometry_type']}, {schema['crs']})"
+                  for gpkg_file, schema in zip(gpkg_files, schemas)
+                  if (schema['fields'], schema['geometry_type'], schema['crs'])
+                  != (reference['fields'], reference['geometry_type'], reference['crs'])]
+    if mismatched:
+        raise ValueError(f"GPKG files do not have the same structure as {gpkg_files[0]} "
+                         f"({reference['fields']}, {reference['geometry_type']}, {reference['crs']}): "
+                         + ", ".join(mismatched))
+    text_fields = [field for i, field in enumerate(reference['fields'])
+                   if len(set(schema['dtypes'][i] for schema in schemas)) > 1]
+    return reference, text_fields
+
+
+def combine_gpkgs(gpkg_result_dir, gpkg_out_path, streaming=True, batch_size=65536):
+    """Combines mutiple geopackage into one dataset (.gpkgs need to have the same structure)
+
+    In streaming mode the features are appended to the output layer in batches, so that the memory use is bounded
+    by the batch size instead of the size of the national dataset. The spatial index is built once after all
+    features are written.
+
+        Args:
+            gpkg_results_dir (string): Path to the folder location of the GPKG files to merge
+            gpkg_out_path (string): Path of the combined GPKG file
+            streaming (bool): Merge the files batch by batch (False: read all files into memory and merge them)
+            batch_size (int): Number of features per batch in streaming mode
+    """
+    with stage_timer('combine gpkgs') as record:
+        gpkg_result_files = subset_store_files(gpkg_result_dir)
+        record['bytes_read'] = sum(file_size(gpkg_result_file) for gpkg_result_file in gpkg_result_files)
+        merge_gpkg_files(gpkg_result_files, gpkg_out_path, streaming=streaming, batch_size=batch_size)
+        record['bytes_written'] = file_size(gpkg_out_path)
+
+
+def merge_gpkg_files(gpkg_result_files, gpkg_out_path, streaming=True, batch_size=65536):
+    """Merges GPKG files into one dataset (see combine_gpkgs).
+
+    Args:
+        gpkg_result_files (list): List of paths to the GPKG files to merge
+        gpkg_out_path (string): Path of the combined GPKG file
+        streaming (bool): Merge the files batch by batch (False: read all files into memory and merge them)
+        batch_size (int): Number of features per batch in streaming mode
+    """
+    import pandas as pd
+    import geopandas as gpd
+    import pyarrow as pa
+    import pyogrio
+    from pathlib import Path
+    from pyogrio.raw import open_arrow
+
+    if not gpkg_result_files:
+        print("No GPKG files to combine")
+        return
+    reference, text_fields = validate_gpkg_schemas(gpkg_result_files)
+    if text_fields:
+        print(f"Fields merged as text (different types in the GPKG files): {text_fields}")
+
+    if not streaming:
+        gdfs = [gpd.read_file(i) for i in gpkg_result_files]
+        gdf = gpd.GeoDataFrame(pd.concat([gdf.astype({field: str for field in text_fields}) for gdf in gdfs],
+                                         ignore_index=True), crs=reference['crs'])
+        gdf.to_file(gpkg_out_path, driver='GPKG')
+        return
+
+    # the output schema is the schema of the first file with the fields that differ in type converted to text
+    with open_arrow(gpkg_result_files[0], use_pyarrow=True) as (meta, reader):
+        schema = reader.schema
+        geometry_name = meta['geometry_name'] or 'geometry'
+    for field in text_fields:
+        schema = schema.set(schema.get_field_index(field), pa.field(field, pa.string()))
+
+    def batches():
+        for gpkg_result_file in gpkg_result_files:
+            print(f"Appending: {Path(gpkg_result_file).stem}")
+            with open_arrow(gpkg_result_file, batch_size=batch_size, use_pyarrow=True) as (meta, reader):
+                for batch in reader:
+                    # field names were validated, the geometry column name can differ between files
+                    columns = [column.cast(field.type) for column, field in zip(batch.columns, schema)]
+                    yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    if os.path.exists(gpkg_out_path):
+        os.remove(gpkg_out_path)
+    # writing all batches in one session lets GDAL build the spatial index once at the end
+    pyogrio.write_arrow(pa.RecordBatchReader.from_batches(schema, batches()), gpkg_out_path,
+                        layer=Path(gpkg_out_path).stem, driver='GPKG', geometry_name=geometry_name,
+                        geometry_type=reference['geometry_type'], crs=reference['crs'],
+                        layer_options={'SPATIAL_INDEX': 'YES'})
+
+
+def hilbert_order(coordinates, level=HILBERT_LEVEL):
+    """Returns the order of points along a Hilbert curve over the LV95 bounds of Switzerland.
+
+    Points that are close to each other are close in this order, so that the features of a map extent are stored in
+    few blocks of the visualisation files (index nodes of FlatGeobuf, row groups of GeoParquet).
+
+    Args:
+        coordinates (ndarray): Coordinates E and N of the points (shape n x 2)
+        level (int): Level of the Hilbert curve
+
+    Returns:
+        ndarray: Indices of the points in the order of the curve
+    """
+    import geopandas as gpd
+    import numpy as np
+    import shapely
+
+    bounds = (LV95_EAST_BOUNDS[0], LV95_NORTH_BOUNDS[0], LV95_EAST_BOUNDS[1], LV95_NORTH_BOUNDS[1])
+    # points outside of the bounds are sorted to the border of the curve
+    coordinates = np.clip(coordinates, bounds[:2], bounds[2:])
+    distance = gpd.GeoSeries(shapely.points(coordinates)).hilbert_distance(total_bounds=bounds, level=level)
+    return np.argsort(distance.to_numpy(), kind='stable')
+
+
+def grid_statistics(points, cell_size):
+    """Calculates the statistics per cell of a square grid in LV95 (summary layers of the visualisation).
+
+    Args:
+        points (DataFrame): Point table with the coordinates E and N (see read_subset_points)
+        cell_size (int): Cell size in meters
+
+    Returns:
+        GeoDataFrame: Statistics with one row per cell with points (see RESULT_COLUMNS, key Zelle with the lower
+            left corner of the cell in km) and the cell polygons
+    """
+    import geopandas as gpd
+    import numpy as np
+    import pandas as pd
+    import shapely
+
+    cells = np.floor(points[['E', 'N']].to_numpy() / cell_size).astype(np.int64)
+    # one integer key per cell is much faster to make unique than the pairs of cell indices
+    origin = cells.min(axis=0)
+    rows = cells[:, 1].max() - origin[1] + 1
+    keys, inverse = np.unique((cells[:, 0] - origin[0]) * rows + cells[:, 1] - origin[1], return_inverse=True)
+    corners = np.stack([keys // rows + origin[0], keys % rows + origin[1]], axis=1)
+    labels = [f"{east * cell_size / 1000:g}_{north * cell_size / 1000:g}" for east, north in corners]
+    points = points.assign(Zelle=pd.Categorical.from_codes(inverse.ravel(), labels))
+    df_grid = calculate_ampelcode_statistics(points, keys=['Zelle'])
+    # cells with points of different Berechnungsintervalle are 'variabel'
+    df_grid['Berechnungsintervall [m]'] = df_grid['Berechnungsintervall [m]'].astype(str)
+    corners = corners[pd.Index(labels).get_indexer(df_grid['Zelle'])] * cell_size
+    geometry = shapely.box(corners[:, 0], corners[:, 1], corners[:, 0] + cell_size, corners[:, 1] + cell_size)
+    return gpd.GeoDataFrame(df_grid, geometry=geometry, crs='EPSG:2056')
+
+
+def export_visualisation(subset_dir, fgb_path=None, parquet_dir=None, grid_path=None,
+                         grid_sizes=VISUALISATION_GRID_SIZES, row_group_size=16384):
+    """Writes the exported subsets of all cantons in spatially indexed formats for the visualisation in QGIS.
+
+    The points are sorted along a Hilbert curve (see hilbert_order) and written as FlatGeobuf file with spatial
+    index and as GeoParquet dataset partitioned by canton (one folder Kanton=<canton> per canton, row groups with
+    bounding boxes). The summary layers with the statistics per grid cell (see grid_statistics) are written to
+    one GPKG file with one layer Raster_<size>m per cell size, for the small scales of the map.
+
+    Args:
+        subset_dir (string): Path to the folder of the exported subsets
+        fgb_path (string): Path of the FlatGeobuf file (None: not written)
+        parquet_dir (string): Path of the folder of the GeoParquet dataset (None: not written)
+        grid_path (string): Path of the GPKG file of the summary layers (None: not written)
+        grid_sizes (list): Cell sizes of the summary layers in meters
+        row_group_size (int): Number of points per row group of the GeoParquet files
+    """
+    import shutil
+    import geopandas as gpd
+    from pathlib import Path
+
+    points = read_subset_points(subset_store_files(subset_dir))
+    if points.empty:
+        print(f"No subsets to export: {subset_dir}")
+        return
+    with stage_timer('hilbert sort') as record:
+        points = points.take(hilbert_order(points[['E', 'N']].to_numpy())).reset_index(drop=True)
+        record['rows'] = len(points)
+    gdf = gpd.GeoDataFrame(points.drop(columns=['E', 'N']), geometry=gpd.points_from_xy(points['E'], points['N']),
+                           crs='EPSG:2056')
+
+    if fgb_path is not None:
+        with stage_timer('flatgeobuf write') as record:
+            print(f"Writing: {fgb_path}")
+            os.makedirs(os.path.dirname(fgb_path) or '.', exist_ok=True)
+            gdf.to_file(fgb_path, layer=Path(fgb_path).stem, driver='FlatGeobuf', engine='pyogrio',
+                        use_arrow=True, SPATIAL_INDEX='YES')
+            record['rows'] = len(gdf)
+            record['bytes_written'] = file_size(fgb_path)
+
+    if parquet_dir is not None:
+        with stage_timer('geoparquet write') as record:
+            print(f"Writing: {parquet_dir}")
+            shutil.rmtree(parquet_dir, ignore_errors=True)
+            record['bytes_written'] = 0
+            for canton, gdf_canton in gdf.groupby('Kanton', observed=True, sort=True):
+                # the canton is part of the folder name (hive partitioning), not a column of the files
+                parquet_path = os.path.join(parquet_dir, f"Kanton={canton}", 'part-0.parquet')
+                os.makedirs(os.path.dirname(parquet_path))
+                gdf_canton.drop(columns='Kanton').to_parquet(parquet_path, index=False, row_group_size=row_group_size,
+                                                             write_covering_bbox=True)
+                record['bytes_written'] += file_size(parquet_path)
+            record['rows'] = len(gdf)
+
+    if grid_path is not None:
+        with stage_timer('grid summary write') as record:
+            print(f"Writing: {grid_path}")
+            if os.path.exists(grid_path):
+                os.remove(grid_path)
+            record['rows'] = 0
+            for cell_size in grid_sizes:
+                gdf_grid = grid_statistics(points, cell_size)
+                gdf_grid.to_file(grid_path, layer=f"Raster_{cell_size}m", driver='GPKG', engine='pyogrio')
+                record['rows'] += len(gdf_grid)
+            record['bytes_written'] = file_size(grid_path)
+
+
+def pipeline_paths(input_root='Data', output_root=None, year=2021):
+    """Returns the folders and files of the processing pipeline.
+
+    The input root contains the ILI XTF files, the converted GPKG files, the corrected Excel files, the cache and
+    the subsets per format. The output root contains the results, the combined subsets, the visualisation files,
+    the correction logs, the compatibility report, the run report and the pipeline state.
+
+    Args:
+        input_root (string): Path to the input folder
+        output_root (string): Path to the output folder (None: RESULTS in the input folder)
+        year (int): Year of the campaign (used in the names of the result files)
+
+    Returns:
+        dict: Path per name
+    """
+    output_root = os.path.join(input_root, 'RESULTS') if output_root is None else output_root
+    subset_dir = os.path.join(output_root, 'GPKG_EXPORT_SUBSET')
+    return {
+        'input_root': input_root,
+        'output_root': output_root,
+        'ili_dir': os.path.join(input_root, 'ILI_XTF'),
+        'gpkg_dir': os.path.join(input_root, 'ILI_GPKG_CONVERT'),
+        'xlsx_dir': os.path.join(input_root, 'XLSX_CORRECTED'),
+        'ili_cache_dir': os.path.join(input_root, 'CACHE', 'ILI_GPKG'),
+        'xlsx_cache_dir': os.path.join(input_root, 'CACHE', 'XLSX'),
+        'sidecar_dir': os.path.join(input_root, 'CACHE', 'XLSX_SIDECAR'),
+        'region_cache_dir': os.path.join(input_root, 'CACHE', 'REGIONS'),
+        'ili_subset_dirs': [subset_dir, os.path.join(input_root, 'ILI_GPKG_EXPORT_SUBSET')],
+        'xlsx_subset_dirs': [subset_dir, os.path.join(input_root, 'XLSX_GPKG_EXPORT_SUBSET')],
+        'subset_dir': subset_dir,
+        'correction_dir': os.path.join(output_root, 'XLSX_CORRECTIONS'),
+        'ili_results': os.path.join(output_root, 'ILI_GPKG_STATISTICS.parquet'),
+        'xlsx_results': os.path.join(output_root, 'XLSX_GPKG_STATISTICS.parquet'),
+        'results': os.path.join(output_root, f'ERKAS_Strassen_Analyse_{year}.xlsx'),
+        'combined_gpkg': os.path.join(output_root, f'ERKAS_Strassen_{year}_CH.gpkg'),
+        'visualisation_fgb': os.path.join(output_root, f'ERKAS_Strassen_{year}_CH.fgb'),
+        'visualisation_parquet': os.path.join(output_root, f'ERKAS_Strassen_{year}_CH_parquet'),
+        'visualisation_grid': os.path.join(output_root, f'ERKAS_Strassen_{year}_CH_Raster.gpkg'),
+        'preflight_report': os.path.join(output_root, 'preflight_report.csv'),
+        'state': os.path.join(output_root, 'pipeline_state.json'),
+        'report': os.path.join(output_root, 'run_report.json'),
+        'profile': os.path.join(output_root, 'run_profile.prof'),
+    }
+
+
+def save_stage_results(df_results, results_path, cantons=None):
+    """Stores the statistics of a stage for the following stages and resumed runs.
+
+    If only some cantons were processed, the rows of the other cantons of earlier runs are kept.
+
+    Args:
+        df_results (DataFrame): Statistics of the stage
+        results_path (string): Path of the stored statistics (see export_results)
+        cantons (list): Abbreviations of the processed cantons (None: all cantons)
+    """
+    import pandas as pd
+
+    if cantons is not None and os.path.exists(results_path):
+        df_previous = read_results(results_path)
+        replaced = {canton.upper() for canton in cantons} | set(df_results['Kanton'].astype(str))
+        df_previous = df_previous[~df_previous['Kanton'].astype(str).isin(replaced)]
+        df_results = pd.concat([df_previous, df_results], ignore_index=True).sort_values('Kanton', kind='stable',
+                                                                                         ignore_index=True)
+    export_results(df_results, results_path)
+
+
+def run_stage(stage, paths, cantons=None, workers=None):
+    """Runs one stage of the processing pipeline (see PIPELINE_STAGES).
+
+    The statistics stages store their statistics in the output folder, so that combine_results can run in a later
+    (resumed) run.
+
+    Args:
+        stage (string): Name of the stage
+        paths (dict): Folders and files of the pipeline (see pipeline_paths)
+        cantons (list): Abbreviations of the cantons to process (None: all cantons)
+        workers (int): Number of worker processes per stage (1: sequential, None: number of CPUs)
+    """
+    if stage not in PIPELINE_STAGES:
+        raise ValueError(f"Unknown stage: {stage} (stages: {', '.join(PIPELINE_STAGES)})")
+    with stage_timer(PIPELINE_RECORD_PREFIX + stage):
+        if stage == 'convert':
+            # GPKG files that are newer than the XTF files are kept
+            if os.path.exists(paths['ili_dir']):
+                ilixtf2gpkg(paths['ili_dir'], paths['gpkg_dir'], workers=workers, cantons=cantons)
+            else:
+                print(f"No ILI XTF files to convert: {paths['ili_dir']}")
+        elif stage == 'preflight':
+            preflight_inputs(paths['gpkg_dir'], paths['xlsx_dir'], paths['preflight_report'], workers=workers,
+                             cantons=cantons)
+        elif stage == 'ili_stats':
+            # only compatible with model version >2_0
+            df_results = calculate_statistics_from_ili_gpkg(paths['gpkg_dir'], workers=workers,
+                                                            cache_dir=paths['ili_cache_dir'],
+                                                            subset_dirs=paths['ili_subset_dirs'], cantons=cantons,
+                                                            skip_files=invalid_preflight_files(
+                                                                paths['preflight_report']))
+            save_stage_results(df_results, paths['ili_results'], cantons)
+        elif stage == 'xlsx_stats':
+            df_results = calculate_statistics_from_xlsx_file(paths['xlsx_dir'], workers=workers,
+                                                             cache_dir=paths['xlsx_cache_dir'],
+                                                             sidecar_dir=paths['sidecar_dir'],
+                                                             subset_dirs=paths['xlsx_subset_dirs'],
+                                                             correction_dir=paths['correction_dir'], cantons=cantons,
+                                                             skip_files=invalid_preflight_files(
+                                                                 paths['preflight_report']))
+            save_stage_results(df_results, paths['xlsx_results'], cantons)
+        elif stage == 'combine_results':
+            result_files = [path for path in [paths['ili_results'], paths['xlsx_results']] if os.path.exists(path)]
+            combine_results_xlsx(result_files, paths['results'])
+        elif stage == 'combine_gpkgs':
+            print("Write combined .gpkg file for entire Switzerland")
+            combine_gpkgs(paths['subset_dir'], paths['combined_gpkg'])
+        else:
+            print("Write spatially indexed files for the visualisation of entire Switzerland")
+            export_visualisation(paths['subset_dir'], paths['visualisation_fgb'], paths['visualisation_parquet'],
+                                 paths['visualisation_grid'])
+
+
+def load_pipeline_state(state_path):
+    """Loads the state of the pipeline stages of earlier runs.
+
+    Args:
+        state_path (string): Path to the state file
+
+    Returns:
+        dict: State with the status, time, cantons and error per stage
+    """
+    import json
+
+    if not os.path.exists(state_path):
+        return {'stages': {}}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_pipeline_state(state_path, state):
+    """Saves the state of the pipeline stages (written to a temporary file first, so that a failed run can not
+    leave a broken state file).
+
+    Args:
+        state_path (string): Path to the state file
+        state (dict): State of the stages (see load_pipeline_state)
+    """
+    import json
+
+    if os.path.dirname(state_path):
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    with open(state_path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + '.tmp', state_path)
+
+
+def run_pipeline(stages=None, cantons=None, input_root='Data', output_root=None, year=2021, workers=None,
+                 resume=False, concurrent=True):
+    """Runs the stages of the processing pipeline in the order of their dependencies (see PIPELINE_STAGES).
+
+    Stages whose dependencies are completed run at the same time in separate processes (e.g. the ILI and the Excel
+    branch), the worker processes are split between the stages of PIPELINE_POOL_STAGES that start at the same time.
+    Stages that depend on a failed stage are skipped. The state of the stages is saved after each stage,
+    with resume the stages that were completed with the same cantons and input folder are not run again, unless one
+    of their dependencies runs again or was completed later.
+
+    Args:
+        stages (list): Names of the stages to run (None: all stages), dependencies that are not selected are
+            expected to be completed in an earlier run
+        cantons (list): Abbreviations of the cantons to process (None: all cantons)
+        input_root (string): Path to the input folder (see pipeline_paths)
+        output_root (string): Path to the output folder (None: RESULTS in the input folder)
+        year (int): Year of the campaign (used in the names of the result files)
+        workers (int): Number of worker processes of the pipeline, shared by the stages that run at the same time
+            (1: sequential, None: number of CPUs)
+        resume (bool): Skip the stages that were completed in an earlier run
+        concurrent (bool): Run independent stages at the same time (False: one stage after the other in this
+            process, e.g. for profiling)
+
+    Returns:
+        dict: Status per stage (done, failed, skipped or completed for stages of an earlier run)
+    """
+    import time
+    import tracemalloc
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from datetime import datetime
+    from functools import partial
+
+    unknown = [stage for stage in stages or [] if stage not in PIPELINE_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages: {unknown} (stages: {', '.join(PIPELINE_STAGES)})")
+    cantons = None if cantons is None else sorted({canton.upper() for canton in cantons})
+    paths = pipeline_paths(input_root, output_root, year)
+    state = load_pipeline_state(paths['state'])
+    status = {}
+    waiting = [stage for stage in PIPELINE_STAGES if stages is None or stage in stages]
+    if resume:
+        # the stages are in the order of their dependencies, a stage is outdated if a dependency runs again or
+        # finished after it
+        for stage in list(waiting):
+            previous = state['stages'].get(stage, {})
+            outdated = any(dependency in waiting or
+                           state['stages'].get(dependency, {}).get('finished', '') > previous.get('finished', '')
+                           for dependency in PIPELINE_STAGES[stage])
+            if previous.get('status') == 'done' and previous.get('cantons') == cantons and \
+                    previous.get('input_root') == input_root and not outdated:
+                print(f"Stage already completed: {stage} ({previous['finished']})")
+                waiting.remove(stage)
+                status[stage] = 'completed'
+
+    def finish(stage, stage_status, start, error=None):
+        status[stage] = stage_status
+        state['stages'][stage] = {'status': stage_status,
+                                  'finished': datetime.now().isoformat(timespec='milliseconds'),
+                                  'seconds': time.perf_counter() - start, 'cantons': cantons,
+                                  'input_root': input_root, 'error': error}
+        save_pipeline_state(paths['state'], state)
+        print(f"Stage {stage_status}: {stage}" + (f" ({error})" if error else ""))
+
+    budget = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=len(PIPELINE_STAGES)) if concurrent else None
+    running = {}
+    try:
+        while waiting or running:
+            ready = []
+            for stage in list(waiting):
+                dependencies = PIPELINE_STAGES[stage]
+                if any(status.get(dependency) in ['failed', 'skipped'] for dependency in dependencies):
+                    waiting.remove(stage)
+                    finish(stage, 'skipped', time.perf_counter(), error='dependency failed')
+                elif not any(dependency in waiting + ready or dependency in [name for name, _, _ in running.values()]
+                             for dependency in dependencies):
+                    waiting.remove(stage)
+                    ready.append(stage)
+
+            # the free worker processes are split between the stages with a process pool that start now
+            pool_stages = [stage for stage in ready if stage in PIPELINE_POOL_STAGES]
+            free_workers = budget - sum(stage_workers for _, _, stage_workers in running.values())
+            for stage in ready:
+                stage_workers = 0
+                if stage in pool_stages:
+                    stage_workers = budget if executor is None else max(1, free_workers // len(pool_stages))
+                worker = partial(run_stage, paths=paths, cantons=cantons, workers=max(1, stage_workers))
+                print(f"Stage started: {stage}" + (f" ({stage_workers} workers)" if stage_workers else ""))
+                if executor is None:
+                    start = time.perf_counter()
+                    try:
+                        worker(stage)
+                        finish(stage, 'done', start)
+                    except Exception as e:
+                        finish(stage, 'failed', start, error=f"{type(e).__name__}: {e}")
+                else:
+                    future = executor.submit(run_with_stage_records, worker, stage, tracemalloc.is_tracing())
+                    running[future] = (stage, time.perf_counter(), stage_workers)
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, start, _ = running.pop(future)
+                try:
+                    _, records = future.result()
+                    STAGE_RECORDS.extend(records)
+                    finish(stage, 'done', start)
+                except Exception as e:
+                    finish(stage, 'failed', start, error=f"{type(e).__name__}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return status
+
+
+def main(stages=None, cantons=None, input_root='Data', output_root=None, year=2021, workers=None, resume=False,
+         profile=False, track_memory=False):
+    """Runs the processing pipeline (see run_pipeline) and writes a run report (run_report.json in the output
+    folder).
+
+    Args:
+        stages (list): Names of the stages to run (None: all stages)
+        cantons (list): Abbreviations of the cantons to process (None: all cantons)
+        input_root (string): Path to the input folder (see pipeline_paths)
+        output_root (string): Path to the output folder (None: RESULTS in the input folder)
+        year (int): Year of the campaign (used in the names of the result files)
+        workers (int): Number of worker processes of the pipeline, shared by the stages that run at the same time
+            (1: sequential, None: number of CPUs)
+        resume (bool): Skip the stages that were completed in an earlier run
+        profile (bool): Profile the run with cProfile (run_profile.prof in the output folder), the stages run one
+            after the other and the cantons are processed in this process (workers=1), so that the profile contains
+            the reading and parsing of the files
+        track_memory (bool): Measure the peak memory of the stages with tracemalloc (slows down the run)
+
+    Returns:
+        dict: Status per stage (see run_pipeline)
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    warnings.filterwarnings("ignore")
+    STAGE_RECORDS.clear()
+    paths = pipeline_paths(input_root, output_root, year)
+    if track_memory:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        # cProfile only sees this process, the worker processes would hide the processing of the cantons
+        workers = 1
+        profiler.enable()
+    try:
+        with stage_timer('total'):
+            status = run_pipeline(stages=stages, cantons=cantons, input_root=input_root, output_root=output_root,
+                                  year=year, workers=workers, resume=resume, concurrent=not profile)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(paths['output_root'], exist_ok=True)
+            profiler.dump_stats(paths['profile'])
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        write_run_report(paths['report'], profile_path=paths['profile'] if profile else None)
+        if track_memory:
+            tracemalloc.stop()
+    return status
+
+
+def print_pipeline_state(input_root='Data', output_root=None):
+    """Prints the stages of the pipeline with their dependencies and the state of the last runs.
+
+    Args:
+        input_root (string): Path to the input folder (see pipeline_paths)
+        output_root (string): Path to the output folder (None: RESULTS in the input folder)
+    """
+    paths = pipeline_paths(input_root, output_root)
+    state = load_pipeline_state(paths['state'])
+    print(f"{'stage':<18}{'depends on':<26}{'status':<10}{'finished':<25}cantons")
+    for stage, dependencies in PIPELINE_STAGES.items():
+        entry = state['stages'].get(stage, {})
+        cantons = 'all' if entry.get('cantons') is None else ' '.join(entry['cantons'])
+        print(f"{stage:<18}{', '.join(dependencies) or '-':<26}{entry.get('status', '-'):<10}"
+              f"{entry.get('finished', '-'):<25}{cantons if entry else '-'}")
+        if entry.get('error'):
+            print(f"    {entry['error']}")
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    roots = argparse.ArgumentParser(add_help=False)
+    roots.add_argument('--input-root', default='Data', help='input folder (default: Data)')
+    roots.add_argument('--output-root', default=None, help='output folder (default: RESULTS in the input folder)')
+    parser = argparse.ArgumentParser(description='Calculates the ERKAS statistics of the cantonal files.')
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', parents=[roots], help='run the processing pipeline (default command)')
+    run_parser.add_argument('--stages', nargs='+', choices=list(PIPELINE_STAGES), default=None,
+                            help='stages to run (default: all stages)')
+    run_parser.add_argument('--cantons', nargs='+', default=None, help='cantons to process, e.g. ZH BE')
+    run_parser.add_argument('--year', type=int, default=2021, help='year of the campaign (names of the results)')
+    run_parser.add_argument('--workers', type=int, default=None,
+                            help='worker processes, shared by the stages running at the same time '
+                                 '(default: number of CPUs)')
+    run_parser.add_argument('--resume', action='store_true', help='skip the stages completed in an earlier run')
+    run_parser.add_argument('--profile', action='store_true',
+                            help='profile the run with cProfile (stages and cantons run sequentially)')
+    run_parser.add_argument('--track-memory', action='store_true', help='measure the peak memory of the stages')
+    subparsers.add_parser('status', parents=[roots], help='print the stages and the state of the last runs')
+    regional_parser = subparsers.add_parser('regional', parents=[roots],
+                                            help='calculate the statistics per region of a polygon layer')
+    regional_parser.add_argument('regions', help='region layer (polygons), e.g. Data/REGIONS/Bezirke.gpkg')
+    regional_parser.add_argument('field', help='field of the region layer with the name of the region, e.g. Bezirk')
+    regional_parser.add_argument('--layer', default=None, help='layer of the region file (default: first layer)')
+    regional_parser.add_argument('--export', default=None,
+                                 help='result file (default: ERKAS_Strassen_<field>.xlsx in the output folder)')
+    compare_parser = subparsers.add_parser('compare', parents=[roots],
+                                           help='compare two campaigns point by point')
+    compare_parser.add_argument('old', help='subset folder or combined GPKG file of the older campaign')
+    compare_parser.add_argument('new', help='subset folder or combined GPKG file of the newer campaign')
+    compare_parser.add_argument('--tolerance', type=float, default=2.0,
+                                help='maximum distance of matched points in meters (default: 2)')
+    compare_parser.add_argument('--name', default='ERKAS_Strassen_Vergleich',
+                                help='name of the result files in the output folder '
+                                     '(default: ERKAS_Strassen_Vergleich)')
+    arguments = sys.argv[1:]
+    if not arguments or arguments[0] not in ['run', 'status', 'regional', 'compare', '-h', '--help']:
+        arguments = ['run'] + arguments
+    args = parser.parse_args(arguments)
+
+    if args.command == 'status':
+        print_pipeline_state(args.input_root, args.output_root)
+    elif args.command == 'regional':
+        # the subsets of the last run of the pipeline are assigned to the regions
+        paths = pipeline_paths(args.input_root, args.output_root)
+        export_path = args.export or os.path.join(paths['output_root'], f'ERKAS_Strassen_{args.field}.xlsx')
+        calculate_regional_statistics(paths['subset_dir'], args.regions, args.field, export_path=export_path,
+                                      layer=args.layer, cache_dir=paths['region_cache_dir'])
+    elif args.command == 'compare':
+        output_root = pipeline_paths(args.input_root, args.output_root)['output_root']
+        compare_campaigns(args.old, args.new, tolerance=args.tolerance,
+                          export_path=os.path.join(output_root, args.name + '.xlsx'),
+                          transitions_export_path=os.path.join(output_root, args.name + '_Uebergaenge.xlsx'),
+                          points_export_path=os.path.join(output_root, args.name + '.gpkg'))
+    else:
+        status = main(stages=args.stages, cantons=args.cantons, input_root=args.input_root,
+                      output_root=args.output_root, year=args.year, workers=args.workers, resume=args.resume,
+                      profile=args.profile, track_memory=args.track_memory)
+        if any(stage_status in ['failed', 'skipped'] for stage_status in status.values()):
+            sys.exit(1)
@@ -0,0 +1,202 @@
+# ERKAS SYNTHETIC DATA GENERATOR
+# Writes synthetic cantonal ERKAS files (ILI converted GPKG files and corrected XLSX files) for the benchmarks
+
+import argparse
+import os
+
+# cantons in the order the synthetic files are generated
+CANTONS = ['ZH', 'BE', 'LU', 'UR', 'SZ', 'OW', 'NW', 'GL', 'ZG', 'FR', 'SO', 'BS', 'BL', 'SH', 'AR', 'AI', 'SG', 'GR',
+           'AG', 'TG', 'TI', 'VD', 'VS', 'NE', 'GE', 'JU']
+
+# approximate number of points of the Durchgangsstrassen of Switzerland (10 m Berechnungsintervall)
+NATIONAL_POINTS = 400000
+
+# share of the points per Ampelcode class (None: no Ampelcode)
+DEFAULT_AMPELCODE_DISTRIBUTION = {0: 0.10, 1: 0.30, 2: 0.20, 3: 0.10, 4: 0.10, 5: 0.10, None: 0.10}
+
+# header of the corrected ERKAS Excel files (without the first column)
+XLSX_HEADER = ['Inhaber', 'Strassenname', 'IDLaenge', 'KBfrei', 'AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW',
+               'Ort_E-Coord', 'Ort_N-Coord', 'DTV', 'Bemerkung']
+
+# number of points of a synthetic road
+ROAD_POINTS = 500
+
+
+def generate_points(n_points, rng, interval=10, ampelcode_distribution=None, kbfrei_share=0.2):
+    """Generates the points of the Durchgangsstrassen of one canton.
+
+    The points follow roads with a length of ROAD_POINTS points and a spacing of the Berechnungsintervall, so that
+    the synthetic files have a spatial order similar to the real files.
+
+    Args:
+        n_points (int): Number of points
+        rng (Generator): Numpy random generator
+        interval (int): Berechnungsintervall (IDLaenge) in meters
+        ampelcode_distribution (dict): Share of the points per Ampelcode class (None: DEFAULT_AMPELCODE_DISTRIBUTION)
+        kbfrei_share (float): Share of the points that are KB-befreit
+
+    Returns:
+        DataFrame: Columns IDLaenge, KBfrei, AmpelCodePers, AmpelCodeOFG, AmpelCodeGW, E and N
+    """
+    import numpy as np
+    import pandas as pd
+
+    if ampelcode_distribution is None:
+        ampelcode_distribution = DEFAULT_AMPELCODE_DISTRIBUTION
+    classes = np.array(list(ampelcode_distribution), dtype=object)
+    shares = np.array(list(ampelcode_distribution.values()), dtype=float)
+
+    # roads start at random locations and change their direction slowly
+    road = np.arange(n_points) // ROAD_POINTS
+    first = np.r_[True, road[1:] != road[:-1]]
+    angle = np.cumsum(rng.normal(0, 0.1, n_points))
+    step_e = np.where(first, 0, np.cos(angle) * interval)
+    step_n = np.where(first, 0, np.sin(angle) * interval)
+    n_roads = -(-n_points // ROAD_POINTS)
+    start_e = rng.uniform(2500000, 2800000, n_roads)
+    start_n = rng.uniform(1100000, 1280000, n_roads)
+
+    points = pd.DataFrame({
+        'IDLaenge': np.full(n_points, interval),
+        'KBfrei': rng.random(n_points) < kbfrei_share,
+    })
+    for column in ['AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW']:
+        points[column] = classes[rng.choice(len(classes), n_points, p=shares / shares.sum())]
+    points['E'] = start_e[road] + pd.Series(step_e).groupby(road).cumsum().to_numpy()
+    points['N'] = start_n[road] + pd.Series(step_n).groupby(road).cumsum().to_numpy()
+    return points
+
+
+def write_ili_gpkg(points, gpkg_path):
+    """Writes the points of one canton as ILI converted GPKG file (points joined with the tables Ergebnis, Vollzug
+    and Verkehrsaufkommen, all fields as text like in the GDAL conversion of the XTF files).
+
+    Args:
+        points (DataFrame): Points of the canton (see generate_points)
+        gpkg_path (string): Path of the GPKG file
+    """
+    import geopandas as gpd
+    import numpy as np
+
+    n_points = len(points)
+    text = {column: points[column].map(lambda value: None if value is None else str(value))
+            for column in ['AmpelCodePers', 'AmpelCodeOFG', 'AmpelCodeGW']}
+    gdf = gpd.GeoDataFrame({
+        'TID': np.arange(n_points).astype(str),
+        'IDLaenge': points['IDLaenge'].astype(str),
+        'Vollzug_KBfrei': np.where(points['KBfrei'], 'true', 'false'),
+        'Ergebnis_AmpelCodePers': text['AmpelCodePers'],
+        'Ergebnis_AmpelCodeOFG': text['AmpelCodeOFG'],
+        'Ergebnis_AmpelCodeGW': text['AmpelCodeGW'],
+        'Verkehrsaufkommen_DTV': (np.arange(n_points) % 20000 + 500).astype(str),
+        'Verkehrsaufkommen_Jahr': np.full(n_points, '2021'),
+        'Vollzug_Bemerkung': np.full(n_points, 'Synthetischer Datensatz'),
+        'Ergebnis_Risiko': np.full(n_points, 'gering'),
+    }, geometry=gpd.points_from_xy(points['E'], points['N']), crs='EPSG:2056')
+    gdf.to_file(gpkg_path, driver='GPKG', engine='pyogrio')
+
+
+def write_corrected_xlsx(points, canton, xlsx_path):
+    """Writes the points of one canton as corrected ERKAS Excel file (header template with a title, a group row, the
+    header in the fourth row, a description and a unit row and the data from the seventh row).
+
+    Args:
+        points (DataFrame): Points of the canton (see generate_points)
+        canton (string): Abbreviation of the canton (field Inhaber)
+        xlsx_path (string): Path of the Excel file
+    """
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('ERKAS')
+    sheet.append(['ERKAS Strassen Erhebung'])
+    sheet.append([])
+    sheet.append(['Nr'] + ['Objekt'] * 3 + ['Ergebnis'] * 4 + ['Ort'] * 2 + ['Verkehr', 'Vollzug'])
+    sheet.append(['Nr'] + XLSX_HEADER)
+    sheet.append(['Laufnummer'] + ['Beschreibung'] * len(XLSX_HEADER))
+    sheet.append([None, None, None, 'm', None, None, None, None, 'm', 'm', 'Fz/d', None])
+    columns = [points[column].tolist() for column in ['IDLaenge', 'KBfrei', 'AmpelCodePers', 'AmpelCodeOFG',
+                                                      'AmpelCodeGW', 'E', 'N']]
+    for n, (idlaenge, kbfrei, pers, ofg, gw, east, north) in enumerate(zip(*columns), start=1):
+        sheet.append([n, canton, 'Hauptstrasse', idlaenge, str(kbfrei), pers, ofg, gw, round(east, 3),
+                      round(north, 3), 500 + n % 20000, None])
+    workbook.save(xlsx_path)
+
+
+def generate_dataset(data_dir, cantons=2, points=NATIONAL_POINTS // len(CANTONS), xlsx_share=0.5,
+                     ampelcode_distribution=None, kbfrei_share=0.2, seed=0):
+    """Writes a synthetic ERKAS dataset to Data/ILI_GPKG_CONVERT and Data/XLSX_CORRECTED of the data folder.
+
+    The points are distributed over the cantons, the first cantons are written as ILI converted GPKG files and the
+    others as corrected Excel files. Every fourth canton has a Berechnungsintervall of 100 m.
+
+    Args:
+        data_dir (string): Path of the folder the Data folder is written to
+        cantons (int): Number of cantons (1 to 26)
+        points (int): Total number of points of all cantons
+        xlsx_share (float): Share of the cantons written as Excel files (one canton: GPKG and Excel file)
+        ampelcode_distribution (dict): Share of the points per Ampelcode class (None: DEFAULT_AMPELCODE_DISTRIBUTION)
+        kbfrei_share (float): Share of the points that are KB-befreit
+        seed (int): Seed of the random generator (same seed: same dataset)
+
+    Returns:
+        dict: Number of points per file path
+    """
+    import numpy as np
+
+    if not 1 <= cantons <= len(CANTONS):
+        raise ValueError(f"Number of cantons needs to be between 1 and {len(CANTONS)}")
+    rng = np.random.default_rng(seed)
+    gpkg_dir = os.path.join(data_dir, 'Data', 'ILI_GPKG_CONVERT')
+    xlsx_dir = os.path.join(data_dir, 'Data', 'XLSX_CORRECTED')
+    os.makedirs(gpkg_dir, exist_ok=True)
+    os.makedirs(xlsx_dir, exist_ok=True)
+
+    n_xlsx = round(cantons * xlsx_share)
+    written = {}
+    for i, canton in enumerate(CANTONS[:cantons]):
+        interval = 100 if i % 4 == 3 else 10
+        n_points = points // cantons + (i < points % cantons)
+        canton_points = generate_points(n_points, rng, interval=interval,
+                                        ampelcode_distribution=ampelcode_distribution, kbfrei_share=kbfrei_share)
+        if cantons == 1 or i < cantons - n_xlsx:
+            gpkg_path = os.path.join(gpkg_dir, f'ERKAS_Strassen_{canton}_2021.gpkg')
+            write_ili_gpkg(canton_points, gpkg_path)
+            written[gpkg_path] = len(canton_points)
+        if cantons == 1 or i >= cantons - n_xlsx:
+            xlsx_path = os.path.join(xlsx_dir, f'ERKAS_Strassen_{canton}_korrigiert.xlsx')
+            write_corrected_xlsx(canton_points, canton, xlsx_path)
+            written[xlsx_path] = len(canton_points)
+        print(f"Generated: {canton} ({len(canton_points)} points)")
+    return written
+
+
+def parse_distribution(text):
+    """Parses an Ampelcode distribution of the form "0:0.1,1:0.3,...,none:0.1".
+
+    Args:
+        text (string): Ampelcode classes and shares separated by commas
+
+    Returns:
+        dict: Share of the points per Ampelcode class
+    """
+    distribution = {}
+    for item in text.split(','):
+        code, share = item.split(':')
+        distribution[None if code.strip().lower() == 'none' else int(code)] = float(share)
+    return distribution
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Writes a synthetic ERKAS dataset.')
+    parser.add_argument('data_dir', help='folder the Data folder is written to')
+    parser.add_argument('--cantons', type=int, default=len(CANTONS), help='number of cantons (1 to 26)')
+    parser.add_argument('--points', type=int, default=NATIONAL_POINTS, help='total number of points')
+    parser.add_argument('--xlsx-share', type=float, default=0.5, help='share of the cantons written as Excel files')
+    parser.add_argument('--ampelcodes', type=parse_distribution, default=None,
+                        help='Ampelcode distribution, e.g. "0:0.1,1:0.3,2:0.2,3:0.1,4:0.1,5:0.1,none:0.1"')
+    parser.add_argument('--kbfrei-share', type=float, default=0.2, help='share of the points that are KB-befreit')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    args = parser.parse_args()
+    generate_dataset(args.data_dir, cantons=args.cantons, points=args.points, xlsx_share=args.xlsx_share,
+                     ampelcode_distribution=args.ampelcodes, kbfrei_share=args.kbfrei_share, seed=args.seed)
@@ -0,0 +1,289 @@
+# ERKAS BENCHMARKS
+# Times the processing functions of ERKAS-processing.py on synthetic datasets and tracks the results per revision
+
+import argparse
+import os
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_PATH = os.path.join(BENCHMARK_DIR, '..', 'ERKAS-processing.py')
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, 'results', 'history.jsonl')
+
+# scales of the synthetic datasets: number of cantons and total number of points
+SCALES = {
+    'canton': (1, 15000),
+    'quarter': (7, 100000),
+    'national': (26, 400000),
+    'national_x10': (26, 4000000),
+}
+
+# benchmarked functions in the order they run (the later ones use the results of the earlier ones)
+BENCHMARKS = ['calculate_statistics_from_ili_gpkg', 'calculate_statistics_from_xlsx_file', 'combine_results_xlsx',
+              'combine_gpkgs']
+
+# folders written by the benchmarked functions, removed before every repetition
+OUTPUT_DIRS = ['Data/RESULTS', 'Data/ILI_GPKG_EXPORT_SUBSET', 'Data/XLSX_GPKG_EXPORT_SUBSET']
+
+
+def load_erkas_processing(script_path=SCRIPT_PATH):
+    """Loads ERKAS-processing.py as module erkas_processing.
+
+    The module is registered in sys.modules so that the functions can be sent to worker processes (only with the
+    fork start method of Linux, use workers=1 on Windows).
+
+    Args:
+        script_path (string): Path to ERKAS-processing.py
+
+    Returns:
+        module: The loaded script
+    """
+    import importlib.util
+    import sys
+
+    spec = importlib.util.spec_from_file_location('erkas_processing', script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['erkas_processing'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def git_revision():
+    """Returns the abbreviated git revision of the repository (with suffix -dirty for uncommitted changes)."""
+    import subprocess
+
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARK_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCHMARK_DIR,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return revision + '-dirty' if changes else revision
+
+
+def prepare_dataset(data_root, scale, seed=0):
+    """Generates the synthetic dataset of a scale, existing datasets with the same parameters are reused.
+
+    Args:
+        data_root (string): Path to the folder of the synthetic datasets
+        scale (string): Name of the scale (see SCALES)
+        seed (int): Seed of the random generator
+
+    Returns:
+        string: Path to the folder of the dataset (contains the Data folder)
+    """
+    import json
+    import shutil
+    from generate_synthetic_data import generate_dataset
+
+    cantons, points = SCALES[scale]
+    data_dir = os.path.join(data_root, f'{scale}_{seed}')
+    parameters = {'cantons': cantons, 'points': points, 'seed': seed}
+    parameters_path = os.path.join(data_dir, 'parameters.json')
+    if os.path.exists(parameters_path):
+        with open(parameters_path) as f:
+            if json.load(f) == parameters:
+                return data_dir
+    if os.path.exists(data_dir):
+        shutil.rmtree(data_dir)
+    print(f"Generating dataset {scale} ({cantons} cantons, {points} points)")
+    generate_dataset(data_dir, cantons=cantons, points=points, seed=seed)
+    with open(parameters_path, 'w') as f:
+        json.dump(parameters, f)
+    return data_dir
+
+
+def benchmark_calls(erkas, workers=1, chunk_size=None):
+    """Returns the calls of the benchmarked functions (relative to the folder of the dataset).
+
+    Args:
+        erkas (module): The loaded script (see load_erkas_processing)
+        workers (int): Number of worker processes of the statistics functions
+        chunk_size (int): Batch size of the chunked mode of the statistics functions (None: in-memory mode)
+
+    Returns:
+        dict: Function without arguments per benchmark name
+    """
+    return {
+        'calculate_statistics_from_ili_gpkg': lambda: erkas.calculate_statistics_from_ili_gpkg(
+            'Data/ILI_GPKG_CONVERT/', 'Data/RESULTS/ILI_GPKG_STATISTICS.xlsx', workers=workers,
+            chunk_size=chunk_size),
+        'calculate_statistics_from_xlsx_file': lambda: erkas.calculate_statistics_from_xlsx_file(
+            'Data/XLSX_CORRECTED/', 'Data/RESULTS/XLSX_GPKG_STATISTICS.xlsx', workers=workers,
+            chunk_size=chunk_size),
+        'combine_results_xlsx': lambda: erkas.combine_results_xlsx(
+            ['Data/RESULTS/ILI_GPKG_STATISTICS.xlsx', 'Data/RESULTS/XLSX_GPKG_STATISTICS.xlsx'],
+            'Data/RESULTS/ERKAS_Strassen_Analyse.xlsx'),
+        'combine_gpkgs': lambda: erkas.combine_gpkgs('Data/RESULTS/GPKG_EXPORT_SUBSET',
+                                                     'Data/RESULTS/ERKAS_Strassen_CH.gpkg'),
+    }
+
+
+def run_scale(erkas, data_dir, benchmarks, repeat=1, workers=1, chunk_size=None):
+    """Runs the benchmarks on one dataset, the best time of the repetitions is kept.
+
+    Args:
+        erkas (module): The loaded script (see load_erkas_processing)
+        data_dir (string): Path to the folder of the dataset
+        benchmarks (list): Names of the benchmarks to run (see BENCHMARKS)
+        repeat (int): Number of repetitions
+        workers (int): Number of worker processes of the statistics functions
+        chunk_size (int): Batch size of the chunked mode of the statistics functions (None: in-memory mode)
+
+    Returns:
+        dict: Result (seconds, status, error) per benchmark name
+    """
+    import contextlib
+    import shutil
+    import time
+
+    calls = benchmark_calls(erkas, workers=workers, chunk_size=chunk_size)
+    results = {name: {'seconds': None, 'status': 'ok', 'error': None} for name in benchmarks}
+    workingdir = os.getcwd()
+    os.chdir(data_dir)
+    try:
+        for i in range(repeat):
+            for output_dir in OUTPUT_DIRS:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            for name in BENCHMARKS:
+                if name not in benchmarks:
+                    continue
+                start = time.perf_counter()
+                try:
+                    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                        calls[name]()
+                except Exception as e:
+                    results[name].update(status='failed', error=f"{type(e).__name__}: {e}")
+                    continue
+                seconds = time.perf_counter() - start
+                if results[name]['seconds'] is None or seconds < results[name]['seconds']:
+                    results[name]['seconds'] = seconds
+    finally:
+        os.chdir(workingdir)
+    return results
+
+
+def load_history(history_path=HISTORY_PATH):
+    """Loads the benchmark results of earlier runs.
+
+    Args:
+        history_path (string): Path to the history file (one JSON record per line)
+
+    Returns:
+        list: Benchmark records in the order they were written
+    """
+    import json
+
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_record(history, record):
+    """Returns the latest record of an earlier revision with the same benchmark, scale, workers, chunk size and
+    machine.
+
+    Args:
+        history (list): Benchmark records of earlier runs (see load_history)
+        record (dict): Benchmark record to compare
+
+    Returns:
+        dict: The previous record or None
+    """
+    keys = ['benchmark', 'scale', 'workers', 'chunk_size', 'machine']
+    for earlier in reversed(history):
+        if earlier['revision'] != record['revision'] and earlier['status'] == 'ok' and all(
+                earlier.get(key) == record[key] for key in keys):
+            return earlier
+    return None
+
+
+def run_benchmarks(scales, benchmarks=None, repeat=1, workers=1, chunk_size=None, seed=0, data_root=None,
+                   threshold=0.25, history_path=HISTORY_PATH):
+    """Runs the benchmarks, appends the results to the history and flags regressions against the previous revision.
+
+    Args:
+        scales (list): Names of the scales to run (see SCALES)
+        benchmarks (list): Names of the benchmarks to run (None: all benchmarks of BENCHMARKS)
+        repeat (int): Number of repetitions per scale, the best time is kept
+        workers (int): Number of worker processes of the statistics functions
+        chunk_size (int): Batch size of the chunked mode of the statistics functions (None: in-memory mode)
+        seed (int): Seed of the synthetic datasets
+        data_root (string): Path to the folder of the synthetic datasets (None: benchmarks/data)
+        threshold (float): Relative slowdown against the previous revision that is flagged as regression
+        history_path (string): Path to the history file
+
+    Returns:
+        list: Benchmark records of this run (with the fields previous_seconds and regression)
+    """
+    import json
+    import platform
+    from datetime import datetime
+
+    benchmarks = BENCHMARKS if benchmarks is None else benchmarks
+    data_root = os.path.join(BENCHMARK_DIR, 'data') if data_root is None else data_root
+    erkas = load_erkas_processing()
+    history = load_history(history_path)
+    revision = git_revision()
+    timestamp = datetime.now().isoformat(timespec='seconds')
+
+    records = []
+    for scale in scales:
+        data_dir = prepare_dataset(data_root, scale, seed=seed)
+        print(f"Running benchmarks: {scale}")
+        results = run_scale(erkas, data_dir, benchmarks, repeat=repeat, workers=workers, chunk_size=chunk_size)
+        for name, result in results.items():
+            record = {'timestamp': timestamp, 'revision': revision, 'machine': platform.node(),
+                      'python': platform.python_version(), 'benchmark': name, 'scale': scale,
+                      'points': SCALES[scale][1], 'workers': workers, 'chunk_size': chunk_size, 'repeat': repeat,
+                      **result}
+            previous = previous_record(history, record)
+            record['previous_seconds'] = None if previous is None else previous['seconds']
+            record['regression'] = bool(previous is not None and record['status'] == 'ok' and
+                                        record['seconds'] > previous['seconds'] * (1 + threshold))
+            records.append(record)
+
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    with open(history_path, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    print_records(records)
+    return records
+
+
+def print_records(records):
+    """Prints the benchmark records as table.
+
+    Args:
+        records (list): Benchmark records (see run_benchmarks)
+    """
+    print(f"{'benchmark':<38}{'scale':<14}{'seconds':>10}{'previous':>10}  status")
+    for record in records:
+        seconds = '-' if record['seconds'] is None else f"{record['seconds']:.2f}"
+        previous = '-' if record['previous_seconds'] is None else f"{record['previous_seconds']:.2f}"
+        status = 'REGRESSION' if record['regression'] else record['status']
+        print(f"{record['benchmark']:<38}{record['scale']:<14}{seconds:>10}{previous:>10}  {status}")
+        if record['error']:
+            print(f"    {record['error']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the ERKAS processing functions on synthetic datasets.')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['canton', 'national'],
+                        help='scales of the synthetic datasets')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=None, help='benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=1, help='repetitions per scale, the best time is kept')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes of the statistics functions')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='batch size of the chunked mode of the statistics functions (default: in-memory mode)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--data-root', default=None, help='folder of the synthetic datasets (default: benchmarks/data)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown against the previous revision that is flagged as regression')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on a regression')
+    args = parser.parse_args()
+    records = run_benchmarks(args.scales, benchmarks=args.benchmarks, repeat=args.repeat, workers=args.workers,
+                             chunk_size=args.chunk_size, seed=args.seed, data_root=args.data_root,
+                             threshold=args.threshold)
+    if args.fail_on_regression and any(record['regression'] for record in records):
+        raise SystemExit(1)
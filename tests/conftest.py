@@ -0,0 +1,16 @@
+# Fixtures of the tests, ERKAS-processing.py is loaded like in the benchmarks (the file name is not importable)
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+
+@pytest.fixture(scope='session')
+def erkas():
+    """The loaded ERKAS-processing.py (see load_erkas_processing)."""
+    from run_benchmarks import load_erkas_processing
+
+    return load_erkas_processing()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_synthetic_data import generate_points, write_corrected_xlsx, write_ili_gpkg
+
+
+def xlsx_statistics(erkas, xlsx_file, chunk_size=None):
+    """Partial statistics of an Excel file in memory (chunk_size None) or in chunked mode."""
+    subset_dirs = [str(xlsx_file.parent / f'subset_{chunk_size}')]
+    correction_dir = f'corrections_{chunk_size}'
+    if chunk_size is None:
+        subset = erkas.process_xlsx_file(xlsx_file, subset_dirs=subset_dirs, correction_dir=correction_dir)
+        return erkas.partial_ampelcode_statistics(subset)
+    return erkas.process_xlsx_file_chunked(xlsx_file, chunk_size=chunk_size, subset_dirs=subset_dirs,
+                                           correction_dir=correction_dir)
+
+
+def test_xlsx_length_unit_is_decided_for_the_whole_file(erkas, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    points = generate_points(1000, np.random.default_rng(0))
+    # lengths in kilometers, the first batch has longer segments than the rest of the file
+    points['IDLaenge'] = np.where(np.arange(len(points)) < 100, 0.8, 0.01)
+    xlsx_file = tmp_path / 'ERKAS_ZH_korrigiert.xlsx'
+    write_corrected_xlsx(points, 'ZH', xlsx_file)
+
+    assert erkas.read_xlsx_length_unit(xlsx_file) == 'km'
+    in_memory = xlsx_statistics(erkas, xlsx_file)
+    chunked = xlsx_statistics(erkas, xlsx_file, chunk_size=100)
+    pd.testing.assert_frame_equal(in_memory.reset_index(drop=True), chunked.reset_index(drop=True))
+    for chunk_size in [None, 100]:
+        log = pd.read_csv(tmp_path / f'corrections_{chunk_size}' / 'ERKAS_ZH_korrigiert.csv')
+        assert log.loc[log['rule'] == 'length unit', 'rows'].tolist() == [1000]
+
+
+def write_dataset(data_dir, empty_canton):
+    """Writes two Excel and two GPKG files with points of different Berechnungsintervall, the files of empty_canton
+    have no points."""
+    rng = np.random.default_rng(1)
+    for i, canton in enumerate(['ZH', 'BE', 'LU']):
+        points = generate_points(0 if canton == empty_canton else 700, rng, interval=[10, 100, 10][i])
+        if canton == 'BE':
+            points.loc[points.index[:10], 'IDLaenge'] = 20
+        xlsx_dir = data_dir / 'Data' / 'XLSX_CORRECTED'
+        gpkg_dir = data_dir / 'Data' / 'ILI_GPKG_CONVERT'
+        xlsx_dir.mkdir(parents=True, exist_ok=True)
+        gpkg_dir.mkdir(parents=True, exist_ok=True)
+        write_corrected_xlsx(points, canton, xlsx_dir / f'ERKAS_{canton}_korrigiert.xlsx')
+        if len(points):
+            write_ili_gpkg(points, gpkg_dir / f'ERKAS_Strassen_{canton}_2021.gpkg')
+
+
+@pytest.mark.parametrize('empty_canton', [None, 'LU'])
+def test_chunked_statistics_are_identical(erkas, tmp_path, monkeypatch, empty_canton):
+    monkeypatch.chdir(tmp_path)
+    write_dataset(tmp_path, empty_canton)
+    for calculate, folder in [(erkas.calculate_statistics_from_xlsx_file, 'Data/XLSX_CORRECTED'),
+                              (erkas.calculate_statistics_from_ili_gpkg, 'Data/ILI_GPKG_CONVERT')]:
+        in_memory = calculate(folder, subset_dirs=['subset_memory'])
+        chunked = calculate(folder, chunk_size=256, subset_dirs=['subset_chunked'])
+        pd.testing.assert_frame_equal(in_memory, chunked)
+        combined = [erkas.combine_results([results]) for results in [in_memory, chunked]]
+        pd.testing.assert_frame_equal(*combined)
+
+
+def test_empty_excel_file_statistics_are_identical(erkas, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    xlsx_file = tmp_path / 'ERKAS_ZH_korrigiert.xlsx'
+    write_corrected_xlsx(generate_points(0, np.random.default_rng(0)), 'ZH', xlsx_file)
+    in_memory = erkas.calculate_statistics_from_xlsx_file(str(tmp_path), subset_dirs=['subset_memory'])
+    chunked = erkas.calculate_statistics_from_xlsx_file(str(tmp_path), chunk_size=256, subset_dirs=['subset_chunked'])
+    pd.testing.assert_frame_equal(in_memory, chunked)
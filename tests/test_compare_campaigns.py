@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+
+def campaign_points(coordinates, canton='ZH'):
+    coordinates = np.asarray(coordinates, dtype='float64')
+    return pd.DataFrame({'Kanton': canton, 'E': coordinates[:, 0], 'N': coordinates[:, 1]})
+
+
+def test_match_takes_next_candidate_when_nearest_is_taken(erkas):
+    # the nearest new point of A (q) is closer to B, A is matched with its other candidate r
+    points_old = campaign_points([[0, 0], [1, 0]])
+    points_new = campaign_points([[0.6, 0], [-0.7, 0]])
+    matches = erkas.match_campaign_points(points_old, points_new, tolerance=1.0)
+    assert matches[['old', 'new']].values.tolist() == [[1, 0], [0, 1]]
+    assert np.allclose(matches['distance'], [0.4, 0.7])
+
+
+def test_match_dense_points_is_greedy(erkas):
+    rng = np.random.default_rng(0)
+    x, y = np.meshgrid(np.arange(50.0), np.arange(40.0))
+    points_old = campaign_points(np.column_stack([x.ravel(), y.ravel()]))
+    points_new = points_old.copy()
+    points_new[['E', 'N']] += rng.uniform(-0.5, 0.5, size=(len(points_new), 2))
+    matches = erkas.match_campaign_points(points_old, points_new, tolerance=1.0)
+    assert matches['old'].is_unique and matches['new'].is_unique
+    assert (matches['distance'] <= 1.0).all()
+    # no pair of two unmatched points is within the tolerance
+    old_free = points_old.drop(index=matches['old'])
+    new_free = points_new.drop(index=matches['new'])
+    distance = np.hypot(new_free['E'].values[:, None] - old_free['E'].values,
+                        new_free['N'].values[:, None] - old_free['N'].values)
+    assert not (distance <= 1.0).any()
+
+
+def test_match_ignores_other_cantons(erkas):
+    points_old = campaign_points([[0, 0]], canton='ZH')
+    points_new = campaign_points([[0.1, 0]], canton='BE')
+    assert erkas.match_campaign_points(points_old, points_new).empty